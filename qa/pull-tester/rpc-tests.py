@@ -25,6 +25,7 @@ import sys
 import subprocess
 import tempfile
 import re
+import unittest
 
 SERIAL_SCRIPTS = [
     # These tests involve enough shielded spends (consuming all CPU
@@ -177,6 +178,26 @@ EXTENDED_SCRIPTS = [
 
 ALL_SCRIPTS = SERIAL_SCRIPTS + BASE_SCRIPTS + ZMQ_SCRIPTS + EXTENDED_SCRIPTS
 
+# Test framework modules with unit tests (unittest.TestCase classes), which
+# are run before the RPC tests.
+TEST_FRAMEWORK_MODULES = [
+    'asyncrpc',
+    'authproxy',
+    'equihash',
+    'flyclient',
+    'hashing',
+    'headerverify',
+    'historystore',
+    'jsonstream',
+    'key',
+    'merkleblock',
+    'mininode',
+    'rpctrace',
+    'script',
+    'testkeys',
+    'zip244',
+]
+
 def main():
     # Parse arguments and pass through unrecognised args
     parser = argparse.ArgumentParser(add_help=False,
@@ -327,6 +348,18 @@ def run_tests(test_handler, test_list, src_dir, build_dir, exeext, jobs=1, enabl
         # Populate cache
         subprocess.check_output([tests_dir + 'create_cache.py'] + flags)
 
+    # Test framework unit tests
+    print("Running unit tests for test framework modules")
+    sys.path.insert(0, tests_dir)
+    framework_tests = unittest.TestSuite()
+    for module in TEST_FRAMEWORK_MODULES:
+        framework_tests.addTest(
+            unittest.TestLoader().loadTestsFromName("test_framework." + module))
+    result = unittest.TextTestRunner(verbosity=1, failfast=True).run(framework_tests)
+    if not result.wasSuccessful():
+        print("Early exiting after failure in test framework unit tests")
+        return False
+
     #Run Tests
     all_passed = True
     time_sum = 0
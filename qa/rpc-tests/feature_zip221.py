@@ -4,7 +4,13 @@
 # file COPYING or https://www.opensource.org/licenses/mit-license.php .
 
 
-from test_framework.flyclient import (ZcashMMRNode, append, delete, make_root_commitment)
+from test_framework.flyclient import (
+    ZcashMMRNode,
+    append,
+    delete,
+    make_root_commitment,
+    rebuild_history_from_node,
+)
 from test_framework.mininode import (CBlockHeader)
 from test_framework.test_framework import BitcoinTestFramework
 from test_framework.util import (
@@ -62,9 +68,17 @@ class Zip221Test(BitcoinTestFramework):
         else:
             v2_data = None
 
-        return ZcashMMRNode.from_block(
+        node = ZcashMMRNode.from_block(
             block_header, height, sapling_root, 0, epoch, v2_data)
 
+        # The leaf that rebuild_history_from_node makes from the same block.
+        assert_equal(
+            ZcashMMRNode.from_getblock(
+                self.nodes[0].getblock(str(height), 2), epoch, height >= 35).serialize(),
+            node.serialize())
+
+        return node
+
     def new_tree(self, height):
         newRoot = self.node_for_block(height - 1)
         assert_equal(
@@ -185,6 +199,18 @@ class Zip221Test(BitcoinTestFramework):
         nu5Root = self.new_tree(36)
         nu5Root = self.update_tree(nu5Root, 37)
 
+        # Rebuild the history of the whole chain from every node, checking
+        # every block's chainhistoryroot, and compare the final tree with the
+        # one built above.
+        print("Verifying the chain history of every node in bulk")
+        for node in self.nodes:
+            rebuild = rebuild_history_from_node(node, batch_size=8, connections=2)
+            print("Node %s" % rebuild)
+            assert_equal(rebuild.n_blocks, 38)
+            assert_equal(
+                rebuild.trees[NU5_BRANCH_ID].root_commitment(),
+                make_root_commitment(nu5Root))
+
 
 if __name__ == '__main__':
     Zip221Test().main()
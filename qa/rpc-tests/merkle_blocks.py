@@ -9,10 +9,18 @@
 #
 
 import string
+from io import BytesIO
 from test_framework.test_framework import BitcoinTestFramework
 from test_framework.authproxy import JSONRPCException
+from test_framework.merkleblock import (
+    build_merkle_block,
+    merkle_block_from_hex,
+    merkle_block_to_hex,
+    verify_merkle_blocks,
+)
+from test_framework.mininode import CBlock
 from test_framework.util import assert_equal, assert_raises, \
-    start_node, connect_nodes
+    start_node, connect_nodes, hex_str_to_bytes
 
 
 class MerkleBlockTest(BitcoinTestFramework):
@@ -71,6 +79,16 @@ class MerkleBlockTest(BitcoinTestFramework):
         assert_equal(self.nodes[2].verifytxoutproof(self.nodes[2].gettxoutproof([txid1, txid2])), txlist)
         assert_equal(self.nodes[2].verifytxoutproof(self.nodes[2].gettxoutproof([txid1, txid2], blockhash)), txlist)
 
+        # The Python proof builder and verifier agree with the node.
+        block = CBlock()
+        block.deserialize(BytesIO(hex_str_to_bytes(self.nodes[0].getblock(blockhash, 0))))
+        for txids in [[txid1], [txid1, txid2], blocktxn]:
+            proof = self.nodes[2].gettxoutproof(txids, blockhash)
+            assert_equal(merkle_block_to_hex(build_merkle_block(block, [int(txid, 16) for txid in txids])), proof)
+            assert_equal(
+                verify_merkle_blocks([merkle_block_from_hex(proof)]),
+                [[int(txid, 16) for txid in self.nodes[2].verifytxoutproof(proof)]])
+
         txin_spent = self.nodes[1].listunspent(1).pop()
         tx3 = self.nodes[1].createrawtransaction([txin_spent], {self.nodes[0].getnewaddress(): 10})
         self.nodes[0].sendrawtransaction(self.nodes[1].signrawtransaction(tx3)["hex"])
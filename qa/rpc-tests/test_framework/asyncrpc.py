@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# Copyright (c) 2026 The Zcash developers
+# Distributed under the MIT software license, see the accompanying
+# file COPYING or https://www.opensource.org/licenses/mit-license.php .
+
+#
+# asyncrpc.py
+#
+# AsyncAuthServiceProxy: an asyncio counterpart of AuthServiceProxy. Calls
+#     are coroutines, sent over a bounded pool of HTTP/1.1 keep-alive
+#     connections on asyncio streams, so one thread can have thousands of
+#     RPCs in flight:
+#
+#         proxy = AsyncAuthServiceProxy(node.url)
+#         hashes = await asyncio.gather(
+#             *(proxy.getblockhash(h) for h in range(n)))
+#
+#     Errors are raised as JSONRPCException, and JSON numbers that look like
+#     floats are parsed as Decimal, as by AuthServiceProxy. Calls are
+#     recorded in rpctrace.TRACER, under the server's host:port, unless
+#     another tracer is given.
+#
+# wait_until_async: comptool.wait_until for coroutines. The mininode peers
+#     run on their own NetworkThread; this checks a predicate on them under
+#     mininode_lock without blocking the event loop.
+#
+
+import asyncio
+import base64
+import decimal
+import http.server
+import simplejson as json
+import threading
+import time
+import unittest
+from urllib.parse import urlparse
+
+from .authproxy import (
+    DEFAULT_POOL_SIZE,
+    HTTP_TIMEOUT,
+    USER_AGENT,
+    AuthServiceProxy,
+    EncodeDecimal,
+    JSONRPCException,
+    _error_code,
+    log,
+)
+from .mininode import mininode_lock
+from .rpctrace import BATCH, TRACER
+
+class _AsyncConnectionPool():
+    # Up to `size` connections to one server. The semaphore is created on
+    # first use, so that it belongs to the loop the proxy is used from.
+
+    def __init__(self, url, timeout, size):
+        self.url = url
+        self.timeout = timeout
+        self.size = size
+        self._available = None
+        self._idle = []
+
+    async def _open(self):
+        port = self.url.port
+        if port is None:
+            port = 443 if self.url.scheme == 'https' else 80
+        return await asyncio.open_connection(
+            self.url.hostname, port, ssl=True if self.url.scheme == 'https' else None)
+
+    async def request(self, request):
+        '''
+        Send a complete HTTP request; return (status, reason, headers, body).
+        The timeout runs from when a connection is free, so calls that are
+        queued behind others for a connection do not time out.
+        '''
+        if self._available is None:
+            self._available = asyncio.Semaphore(self.size)
+        async with self._available:
+            return await asyncio.wait_for(self._send(request), self.timeout)
+
+    async def _send(self, request):
+        # A connection that was idle may have been closed by the server;
+        # if it fails before a response arrives, retry on a new one.
+        while self._idle:
+            (reader, writer) = self._idle.pop()
+            try:
+                return await self._exchange(reader, writer, request)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                writer.close()
+        (reader, writer) = await self._open()
+        return await self._exchange(reader, writer, request)
+
+    async def _exchange(self, reader, writer, request):
+        try:
+            writer.write(request)
+            await writer.drain()
+            response = await _read_response(reader)
+        except BaseException:
+            writer.close()
+            raise
+        (status, reason, headers, body) = response
+        if headers.get('connection', '').lower() == 'close':
+            writer.close()
+        else:
+            self._idle.append((reader, writer))
+        return response
+
+    async def close(self):
+        (idle, self._idle) = (self._idle, [])
+        for (_, writer) in idle:
+            writer.close()
+        for (_, writer) in idle:
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+async def _read_response(reader):
+    status_line = await reader.readuntil(b'\r\n')
+    (_, status, reason) = (status_line.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+    headers = {}
+    while True:
+        line = await reader.readuntil(b'\r\n')
+        if line == b'\r\n':
+            break
+        (name, value) = line.decode('latin-1').split(':', 1)
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            if size == 0:
+                # Skip any trailers.
+                while await reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b''.join(chunks)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    else:
+        body = await reader.read()
+        headers['connection'] = 'close'
+    return (int(status), reason, headers, body)
+
+class AsyncAuthServiceProxy():
+    def __init__(self, service_url, service_name=None, timeout=HTTP_TIMEOUT,
+                 max_connections=DEFAULT_POOL_SIZE, pool=None, tracer=None):
+        self.__service_url = service_url
+        self._service_name = service_name
+        self.__url = urlparse(service_url)
+        (user, passwd) = (self.__url.username, self.__url.password)
+        authpair = (user or '').encode('utf8') + b':' + (passwd or '').encode('utf8')
+        self.__auth_header = b'Basic ' + base64.b64encode(authpair)
+        if tracer is None:
+            tracer = TRACER.for_node(self.__url.netloc.rpartition('@')[2])
+        self.__tracer = tracer
+        self.timeout = timeout if pool is None else pool.timeout
+        self.__pool = pool or _AsyncConnectionPool(self.__url, timeout, max_connections)
+
+    def __getattr__(self, name):
+        if name.startswith('__') and name.endswith('__'):
+            # Python internal stuff
+            raise AttributeError
+        if self._service_name is not None:
+            name = "%s.%s" % (self._service_name, name)
+        return AsyncAuthServiceProxy(self.__service_url, name, pool=self.__pool, tracer=self.__tracer)
+
+    async def close(self):
+        '''Close the idle connections of this proxy's pool.'''
+        await self.__pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _request(self, postdata):
+        body = postdata.encode('utf8')
+        request = b''.join([
+            b'POST ', (self.__url.path or '/').encode('utf8'), b' HTTP/1.1\r\n',
+            b'Host: ', self.__url.hostname.encode('utf8'), b'\r\n',
+            b'User-Agent: ', USER_AGENT.encode('utf8'), b'\r\n',
+            b'Authorization: ', self.__auth_header, b'\r\n',
+            b'Content-type: application/json\r\n',
+            b'Content-Length: ', str(len(body)).encode('utf8'), b'\r\n',
+            b'\r\n',
+            body,
+        ])
+        (status, reason, headers, responsedata) = await self.__pool.request(request)
+        if headers.get('content-type') != 'application/json':
+            raise JSONRPCException({
+                'code': -342, 'message': 'non-JSON HTTP response with \'%i %s\' from server' % (status, reason)})
+        response = json.loads(responsedata.decode('utf8'), parse_float=decimal.Decimal)
+        if isinstance(response, dict) and "error" in response and response["error"] is None:
+            log.debug("<-%s- %s"%(response["id"], json.dumps(response["result"], default=EncodeDecimal)))
+        else:
+            log.debug("<-- "+responsedata.decode('utf8'))
+        return (response, len(responsedata))
+
+    def _trace(self, method, started, request_bytes, response_bytes, error):
+        if self.__tracer is not None:
+            self.__tracer(method, time.perf_counter() - started, request_bytes, response_bytes, error)
+
+    async def __call__(self, *args):
+        call_id = AuthServiceProxy._next_id()
+
+        log.debug("-%s-> %s %s"%(call_id, self._service_name,
+                                 json.dumps(args, default=EncodeDecimal)))
+        postdata = json.dumps({'version': '1.1',
+                               'method': self._service_name,
+                               'params': args,
+                               'id': call_id}, default=EncodeDecimal)
+        started = time.perf_counter()
+        response_size = 0
+        error = None
+        try:
+            (response, response_size) = await self._request(postdata)
+            if response['error'] is not None:
+                raise JSONRPCException(response['error'])
+            elif 'result' not in response:
+                raise JSONRPCException({
+                    'code': -343, 'message': 'missing JSON-RPC result'})
+            else:
+                return response['result']
+        except Exception as e:
+            error = _error_code(e)
+            raise
+        finally:
+            self._trace(self._service_name, started, len(postdata), response_size, error)
+
+    async def _batch(self, rpc_call_list):
+        postdata = json.dumps(list(rpc_call_list), default=EncodeDecimal)
+        log.debug("--> "+postdata)
+        started = time.perf_counter()
+        response_size = 0
+        error = None
+        try:
+            (response, response_size) = await self._request(postdata)
+            return response
+        except Exception as e:
+            error = _error_code(e)
+            raise
+        finally:
+            self._trace(BATCH, started, len(postdata), response_size, error)
+
+async def wait_until_async(predicate, attempts=float('inf'), timeout=float('inf')):
+    attempt = 0
+    start = time.monotonic()
+
+    while attempt < attempts and time.monotonic() - start < timeout:
+        with mininode_lock:
+            if predicate():
+                return True
+        attempt += 1
+        await asyncio.sleep(0.05)
+
+    return False
+
+
+class _EchoRPCHandler(http.server.BaseHTTPRequestHandler):
+    # Answers "echo" with its params, "amount" with a float, and any other
+    # method with an error, over keep-alive connections.
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def call(self, request):
+        if request['method'] == 'echo':
+            return '{"result": %s, "error": null, "id": %s}' % (
+                json.dumps(request['params']), json.dumps(request['id']))
+        elif request['method'] == 'amount':
+            return '{"result": 0.1, "error": null, "id": %s}' % json.dumps(request['id'])
+        return json.dumps({'result': None, 'error': {'code': -32601, 'message': 'Method not found'},
+                           'id': request['id']})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if isinstance(request, list):
+            body = '[%s]' % ', '.join(self.call(r) for r in request)
+        else:
+            body = self.call(request)
+        body = body.encode('utf8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TestFrameworkAsyncRPC(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _EchoRPCHandler)
+        self.server.connections = 0
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.netloc = '127.0.0.1:%d' % self.server.server_address[1]
+        self.url = 'http://user:pass@%s/' % self.netloc
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_calls(self):
+        traced = []
+        def tracer(method, elapsed, request_bytes, response_bytes, error):
+            traced.append((method, error))
+
+        async def run():
+            async with AsyncAuthServiceProxy(self.url, max_connections=2, tracer=tracer) as proxy:
+                results = await asyncio.gather(*(proxy.echo(i, 'x') for i in range(20)))
+                self.assertEqual(results, [[i, 'x'] for i in range(20)])
+                self.assertEqual(await proxy.amount(), decimal.Decimal('0.1'))
+                with self.assertRaises(JSONRPCException) as cm:
+                    await proxy.missing()
+                self.assertEqual(cm.exception.error['code'], -32601)
+                batch = await proxy._batch([
+                    {'version': '1.1', 'method': 'echo', 'params': [1], 'id': 1},
+                    {'version': '1.1', 'method': 'amount', 'params': [], 'id': 2},
+                ])
+                self.assertEqual([r['result'] for r in batch], [[1], decimal.Decimal('0.1')])
+
+        asyncio.run(run())
+        # The calls share the pool's keep-alive connections.
+        self.assertLessEqual(self.server.connections, 2)
+        self.assertEqual(
+            traced, [('echo', None)] * 20 + [('amount', None), ('missing', -32601), (BATCH, None)])
+
+    def test_default_tracer(self):
+        async def run():
+            async with AsyncAuthServiceProxy(self.url) as proxy:
+                await proxy.echo()
+                with self.assertRaises(JSONRPCException):
+                    await proxy.wallet.getbalance()
+
+        asyncio.run(run())
+        # Calls are recorded in TRACER by default, under the server's address.
+        self.assertEqual(TRACER.methods(self.netloc), ['echo', 'wallet.getbalance'])
+        self.assertEqual(TRACER.covered_methods(self.netloc), ['echo'])
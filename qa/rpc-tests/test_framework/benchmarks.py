@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# Copyright (c) 2026 The Zcash developers
+# Distributed under the MIT software license, see the accompanying
+# file COPYING or https://www.opensource.org/licenses/mit-license.php .
+
+#
+# benchmarks.py
+#
+# Micro-benchmarks for the hashing code in the test framework: v5 txids, block
+# auth data roots, and history tree (MMR) appends. Each workload is timed with
+# the shared BLAKE2b prototypes from hashing.py, and with a hasher constructed
+# directly for every digest, as before hashing.py, for comparison. The runs of
+# the two alternate, so that changes in CPU speed affect both alike. Run e.g.
+#
+#   python3 -m test_framework.benchmarks --repeat 5
+#
+# from the qa/rpc-tests directory.
+#
+
+import argparse
+import contextlib
+import random
+import time
+from hashlib import blake2b
+
+from . import blocktools, flyclient, headerverify, merkletree, mininode, script, zip244
+from .flyclient import ZcashMMRNode, append
+from .mininode import (
+    CBlock,
+    COutPoint,
+    CTransaction,
+    CTxIn,
+    CTxOut,
+    ZIP225_VERSION_GROUP_ID,
+)
+from .util import NU5_BRANCH_ID
+from .zip244 import txid_digest
+
+# The modules that import blake2b_personalized or digest_many from hashing.py.
+HASHING_MODULES = [blocktools, flyclient, headerverify, merkletree, mininode, script, zip244]
+
+def _direct_blake2b_personalized(person, digest_size=32):
+    return blake2b(digest_size=digest_size, person=person)
+
+def _direct_digest_many(person, chunks, digest_size=32):
+    digest = blake2b(digest_size=digest_size, person=person)
+    digest.update(b''.join(chunks))
+    return digest.digest()
+
+@contextlib.contextmanager
+def fresh_hashers():
+    '''Construct a new hasher for every digest while in this context.'''
+    saved = []
+    for module in HASHING_MODULES:
+        for (name, direct) in [('blake2b_personalized', _direct_blake2b_personalized),
+                               ('digest_many', _direct_digest_many)]:
+            if hasattr(module, name):
+                saved.append((module, name, getattr(module, name)))
+                setattr(module, name, direct)
+    try:
+        yield
+    finally:
+        for (module, name, f) in saved:
+            setattr(module, name, f)
+
+def make_v5_transactions(count, n_in=2, n_out=2, seed=0):
+    rnd = random.Random(seed)
+    txs = []
+    for _ in range(count):
+        tx = CTransaction()
+        tx.nVersion = 5
+        tx.nVersionGroupId = ZIP225_VERSION_GROUP_ID
+        tx.nConsensusBranchId = NU5_BRANCH_ID
+        tx.nLockTime = rnd.getrandbits(32)
+        for _ in range(n_in):
+            tx.vin.append(CTxIn(
+                COutPoint(rnd.getrandbits(256), rnd.randrange(4)),
+                rnd.randbytes(107), 0xffffffff))
+        for _ in range(n_out):
+            tx.vout.append(CTxOut(rnd.randrange(10**8), rnd.randbytes(25)))
+        txs.append(tx)
+    return txs
+
+def make_mmr_leaves(count, seed=0):
+    rnd = random.Random(seed)
+    leaves = []
+    for height in range(count):
+        header = CBlock()
+        header.nTime = 1600000000 + height
+        header.nBits = 0x200f0f0f
+        header.nNonce = rnd.getrandbits(256)
+        leaves.append(ZcashMMRNode.from_block(
+            header, height, rnd.randbytes(32), 0, NU5_BRANCH_ID))
+    return leaves
+
+def bench_txids(txs):
+    for tx in txs:
+        txid_digest(tx)
+
+def bench_auth_data_root(txs):
+    # Includes computing the auth digests of the transactions.
+    for tx in txs:
+        tx.sha256 = None
+    block = CBlock()
+    block.vtx = txs
+    block.calc_auth_data_root()
+
+def bench_mmr_append(leaves):
+    root = leaves[0]
+    for leaf in leaves[1:]:
+        root = append(root, leaf)
+
+def timed(f, arg):
+    start = time.perf_counter()
+    f(arg)
+    return time.perf_counter() - start
+
+def best_times(f, arg, repeat):
+    '''The best times of f(arg) with fresh and with shared hashers.'''
+    fresh = shared = float('inf')
+    for _ in range(repeat):
+        with fresh_hashers():
+            fresh = min(fresh, timed(f, arg))
+        shared = min(shared, timed(f, arg))
+    return (fresh, shared)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark txid, auth data root, and history tree hashing.')
+    parser.add_argument('--txs', type=int, default=2000,
+                        help='number of v5 transactions (default: 2000)')
+    parser.add_argument('--leaves', type=int, default=1000,
+                        help='number of history tree leaves (default: 1000)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per workload; the best is reported (default: 3)')
+    args = parser.parse_args()
+
+    txs = make_v5_transactions(args.txs)
+    leaves = make_mmr_leaves(args.leaves)
+    workloads = [
+        ('txid', bench_txids, txs, args.txs),
+        ('auth data root', bench_auth_data_root, txs, args.txs),
+        ('MMR append', bench_mmr_append, leaves, args.leaves),
+    ]
+
+    print('%-16s %16s %16s %8s' % ('workload', 'fresh (items/s)', 'shared (items/s)', 'speedup'))
+    for (name, f, arg, items) in workloads:
+        (fresh, shared) = best_times(f, arg, args.repeat)
+        print('%-16s %16.0f %16.0f %7.2fx' % (name, items / fresh, items / shared, fresh / shared))
+
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,7 @@ This module contains utilities for doing coverage analysis on the RPC
 interface.
 
 It provides a way to track which RPC commands are exercised during
-testing.
+testing, from the calls recorded by rpctrace.TRACER.
 
 """
 import os
@@ -18,47 +18,28 @@ import os
 REFERENCE_FILENAME = 'rpc_interface.txt'
 
 
-class AuthServiceProxyWrapper(object):
+class CoverageLog(object):
     """
-    An object that wraps AuthServiceProxy to record specific RPC calls.
+    A consumer of an rpctrace.RPCTracer that writes out, for each node,
+    the RPC methods that it answered successfully (see
+    RPCTracer.covered_methods).
 
     """
-    def __init__(self, auth_service_proxy_instance, coverage_logfile=None):
+    def __init__(self, dirname):
         """
-        Kwargs:
-            auth_service_proxy_instance (AuthServiceProxy): the instance
-                being wrapped.
-            coverage_logfile (str): if specified, write each service_name
-                out to a file when called.
+        Args:
+            dirname (str): the directory to write the coverage files to.
 
         """
-        self.auth_service_proxy_instance = auth_service_proxy_instance
-        self.coverage_logfile = coverage_logfile
+        self.dirname = dirname
 
-    def __getattr__(self, *args, **kwargs):
-        return_val = self.auth_service_proxy_instance.__getattr__(
-            *args, **kwargs)
+    def __eq__(self, other):
+        return isinstance(other, CoverageLog) and self.dirname == other.dirname
 
-        return AuthServiceProxyWrapper(return_val, self.coverage_logfile)
-
-    def __call__(self, *args, **kwargs):
-        """
-        Delegates to AuthServiceProxy, then writes the particular RPC method
-        called to a file.
-
-        """
-        return_val = self.auth_service_proxy_instance.__call__(*args, **kwargs)
-        rpc_method = self.auth_service_proxy_instance._service_name
-
-        if self.coverage_logfile:
-            with open(self.coverage_logfile, 'a+', encoding='utf8') as f:
-                f.write("%s\n" % rpc_method)
-
-        return return_val
-
-    @property
-    def url(self):
-        return self.auth_service_proxy_instance.url
+    def __call__(self, tracer):
+        for n_node in tracer.nodes():
+            with open(get_filename(self.dirname, n_node), 'w', encoding='utf8') as f:
+                f.writelines("%s\n" % method for method in tracer.covered_methods(n_node))
 
 
 def get_filename(dirname, n_node):
@@ -1,6 +1,17 @@
 from operator import itemgetter
+import contextlib
+import io
 import struct
-from functools import reduce
+import unittest
+from functools import lru_cache, reduce
+
+from .hashing import blake2b_personalized
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is optional; without it the pure-Python implementations are used.
+    np = None
 
 DEBUG = False
 VERBOSE = False
@@ -129,6 +140,11 @@ def xor(ha, hb):
     return bytearray(a^b for a,b in zip(ha,hb))
 
 def gbp_basic(digest, n, k):
+    if np is not None:
+        return gbp_basic_np(digest, n, k)
+    return gbp_basic_py(digest, n, k)
+
+def gbp_basic_py(digest, n, k):
     '''Implementation of Basic Wagner's algorithm for the GBP.'''
     validate_params(n, k)
     collision_length = n//(k+1)
@@ -228,7 +244,111 @@ def gbp_basic(digest, n, k):
             j -= 1
     return [get_minimal_from_indices(soln, collision_length+1) for soln in solns]
 
+def sort_rows_np(X):
+    '''
+    Return the permutation that stably sorts the rows of X lexicographically,
+    i.e. the order of X.sort(key=itemgetter(0)) in gbp_basic_py.
+    '''
+    return np.lexsort(X.T[::-1])
+
+@lru_cache(maxsize=None)
+def pair_offsets_np(size):
+    '''The (l, m) loop indices of all pairs l < m in a set of `size` rows.'''
+    return np.triu_indices(size, 1)
+
+def collision_pairs_np(X, lo, hi):
+    '''
+    Find all pairs of rows of the sorted array X that collide on bytes
+    [lo, hi). The pairs are returned as two arrays of row positions, in the
+    order in which gbp_basic_py visits them: sets of colliding rows from the
+    end of the list backwards, and the pairs within each set from its last
+    row backwards.
+    '''
+    N = len(X)
+    if N < 2:
+        empty = np.zeros(0, dtype=np.intp)
+        return (empty, empty)
+    same = (X[1:, lo:hi] == X[:-1, lo:hi]).all(axis=1)
+    starts = np.flatnonzero(np.concatenate(([True], ~same)))
+    ends = np.append(starts[1:], N)
+    sizes = ends - starts
+
+    (A, B, group, pair) = ([], [], [], [])
+    for size in np.unique(sizes[sizes > 1]).tolist():
+        groups = np.flatnonzero(sizes == size)
+        (l, m) = pair_offsets_np(size)
+        last = ends[groups, None] - 1
+        A.append((last - l).ravel())
+        B.append((last - m).ravel())
+        group.append(np.repeat(groups, len(l)))
+        pair.append(np.tile(np.arange(len(l)), len(groups)))
+    if not A:
+        empty = np.zeros(0, dtype=np.intp)
+        return (empty, empty)
+    order = np.lexsort((np.concatenate(pair), -np.concatenate(group)))
+    return (np.concatenate(A)[order], np.concatenate(B)[order])
+
+def distinct_pairs_np(I, a, b):
+    '''Vectorized distinct_indices(I[a[p]], I[b[p]]) for every pair p.'''
+    merged = np.sort(np.concatenate((I[a], I[b]), axis=1), axis=1)
+    return (merged[:, 1:] != merged[:, :-1]).all(axis=1)
+
+def ordered_concat_np(I, a, b):
+    '''Join the index tuples of each pair, lowest first index first.'''
+    swap = (I[a, 0] >= I[b, 0])[:, None]
+    return np.where(
+        swap,
+        np.concatenate((I[b], I[a]), axis=1),
+        np.concatenate((I[a], I[b]), axis=1))
+
+def gbp_basic_np(digest, n, k):
+    '''
+    NumPy implementation of gbp_basic_py. The list is kept as an array of
+    expanded hashes plus an array of index tuples, and each round sorts it
+    with np.lexsort and generates all colliding pairs at once. It returns
+    the same solutions, in the same order, as gbp_basic_py.
+    '''
+    validate_params(n, k)
+    collision_length = n//(k+1)
+
+    # 1) Generate first list
+    indices = np.arange(2**(collision_length+1), dtype=np.uint32)
+    X = expand_rows_np(hash_indices_np(digest, indices, n), n, k)
+    I = indices.reshape(-1, 1)
+
+    # 3) Repeat step 2 until 2n/(k+1) bits remain
+    for i in range(1, k):
+        # 2a) Sort the list
+        order = sort_rows_np(X)
+        (X, I) = (X[order], I[order])
+
+        # 2b) Find next set of unordered pairs with collisions on first n/(k+1) bits
+        (a, b) = collision_pairs_np(
+            X, (i-1)*collision_length//8, i*collision_length//8)
+
+        # 2c) Store tuples (X_i ^ X_j, (i, j)) on the table, skipping pairs
+        # with duplicate indices
+        keep = distinct_pairs_np(I, a, b)
+        (a, b) = (a[keep], b[keep])
+
+        # 2e) Replace previous list with new list
+        (X, I) = (X[a] ^ X[b], ordered_concat_np(I, a, b))
+
+    # k+1) Find a collision on last 2n(k+1) bits
+    order = sort_rows_np(X)
+    (X, I) = (X[order], I[order])
+    (a, b) = collision_pairs_np(
+        X, (k-1)*collision_length//8, (k+1)*collision_length//8)
+    keep = ~(X[a] ^ X[b]).any(axis=1) & distinct_pairs_np(I, a, b)
+    solns = ordered_concat_np(I, a[keep], b[keep])
+    return [get_minimal_from_indices(soln, collision_length+1) for soln in solns.tolist()]
+
 def gbp_validate(digest, minimal, n, k):
+    if np is not None:
+        return gbp_validate_np(digest, minimal, n, k)
+    return gbp_validate_py(digest, minimal, n, k)
+
+def gbp_validate_py(digest, minimal, n, k):
     validate_params(n, k)
     collision_length = n//(k+1)
     hash_length = (k+1)*((collision_length+7)//8)
@@ -278,6 +398,90 @@ def gbp_validate(digest, minimal, n, k):
 
     return True
 
+def indices_from_minimal_np(minimal, bit_len):
+    '''Vectorized get_indices_from_minimal, returning a uint32 array.'''
+    bits = np.unpackbits(np.frombuffer(bytes(minimal), dtype=np.uint8))
+    bits = bits[:len(bits) - len(bits) % bit_len].reshape(-1, bit_len)
+    weights = np.uint32(1) << np.arange(bit_len-1, -1, -1, dtype=np.uint32)
+    return bits.astype(np.uint32) @ weights
+
+def hash_indices_np(digest, indices, n):
+    '''
+    Return the n-bit hash outputs X_i = H(I||V||x_i) for each index as the
+    rows of an (len(indices), n//8) uint8 array. Each BLAKE2b output covers
+    512//n consecutive indices, so it is only computed once.
+    '''
+    indices_per_hash_output = 512//n
+    hash_bytes = n//8
+    (q, r) = np.divmod(indices.astype(np.intp), indices_per_hash_output)
+    (outputs, pos) = np.unique(q, return_inverse=True)
+    tmp_hashes = b''.join(
+        hash_xi(digest.copy(), x).digest()[:indices_per_hash_output*hash_bytes]
+        for x in outputs.tolist())
+    rows = np.frombuffer(tmp_hashes, dtype=np.uint8).reshape(-1, hash_bytes)
+    return rows[pos.ravel()*indices_per_hash_output + r]
+
+def expand_rows_np(hashes, n, k):
+    '''
+    Vectorized expand_array(h, hash_length, collision_length) applied to
+    every row of a uint8 array of n-bit hash outputs.
+    '''
+    collision_length = n//(k+1)
+    width = (collision_length+7)//8
+    bits = np.unpackbits(hashes, axis=1)[:, :(k+1)*collision_length]
+    padded = np.zeros((len(hashes), k+1, 8*width), dtype=np.uint8)
+    padded[:, :, 8*width-collision_length:] = bits.reshape(-1, k+1, collision_length)
+    return np.packbits(padded, axis=2).reshape(-1, (k+1)*width)
+
+def gbp_validate_np(digest, minimal, n, k):
+    '''
+    NumPy implementation of gbp_validate_py. Each round checks every pair of
+    StepRows at once, and reports the same error (for the same pair) as the
+    pure-Python implementation.
+    '''
+    validate_params(n, k)
+    collision_length = n//(k+1)
+    hash_length = (k+1)*((collision_length+7)//8)
+    solution_width = (1 << k)*(collision_length+1)//8
+
+    if len(minimal) != solution_width:
+        print('Invalid solution length: %d (expected %d)' % \
+            (len(minimal), solution_width))
+        return False
+
+    indices = indices_from_minimal_np(minimal, collision_length+1)
+    X = expand_rows_np(hash_indices_np(digest, indices, n), n, k)
+    I = indices.reshape(-1, 1)
+
+    for r in range(1, k+1):
+        # Same byte range as has_collision(..., r, collision_length)
+        (lo, hi) = ((r-1)*collision_length//8, r*collision_length//8)
+        bad_collision = (X[0::2, lo:hi] != X[1::2, lo:hi]).any(axis=1)
+        bad_order = I[1::2, 0] < I[0::2, 0]
+        bad_distinct = (I[0::2, :, None] == I[1::2, None, :]).any(axis=(1, 2))
+        bad = bad_collision | bad_order | bad_distinct
+        if bad.any():
+            i = int(np.argmax(bad))
+            if bad_collision[i]:
+                print('Invalid solution: invalid collision length between StepRows')
+            elif bad_order[i]:
+                print('Invalid solution: Index tree incorrectly ordered')
+            else:
+                print('Invalid solution: duplicate indices')
+            return False
+        X = X[0::2] ^ X[1::2]
+        I = np.concatenate((I[0::2], I[1::2]), axis=1)
+
+    if len(X) != 1:
+        print('Invalid solution: incorrect length after end of rounds: %d' % len(X))
+        return False
+
+    if X[0].any():
+        print('Invalid solution: incorrect number of zeroes: %d' % count_zeroes(bytearray(X[0].tobytes())))
+        return False
+
+    return True
+
 def zcash_person(n, k):
     return b'ZcashPoW' + struct.pack('<II', n, k)
 
@@ -292,3 +496,78 @@ def validate_params(n, k):
         raise ValueError('n must be larger than k')
     if (((n//(k+1))+1) >= 32):
         raise ValueError('Parameters must satisfy n/(k+1)+1 < 32')
+
+
+# The mainnet genesis block: its 108-byte header prefix, nonce and (200, 9)
+# solution, from src/chainparams.cpp.
+MAINNET_GENESIS_HEADER = bytes.fromhex(
+    '040000000000000000000000000000000000000000000000000000000000000000000000'
+    'db4d7a85b768123f1dff1d4c4cece70083b2d27e117b4ac2e31d087988a5eac400000000'
+    '0000000000000000000000000000000000000000000000000000000090041358ffff071f')
+MAINNET_GENESIS_NONCE = 0x1257
+MAINNET_GENESIS_SOLUTION = bytes.fromhex(
+    '000a889f00854b8665cd555f4656f68179d31ccadc1b1f7fb0952726313b16941da348284d67add4686121d4e3d93016'
+    '0c1348d8191c25f12b267a6a9c131b5031cbf8af1f79c9d513076a216ec87ed045fa966e01214ed83ca02dc1797270a4'
+    '54720d3206ac7d931a0a680c5c5e099057592570ca9bdf6058343958b31901fce1a15a4f38fd347750912e14004c73df'
+    'e588b903b6c03166582eeaf30529b14072a7b3079e3a684601b9b3024054201f7440b0ee9eb1a7120ff43f713735494a'
+    'a27b1f8bab60d7f398bca14f6abb2adbf29b04099121438a7974b078a11635b594e9170f1086140b4173822dd6978944'
+    '83e1c6b4e8b8dcd5cb12ca4903bc61e108871d4d915a9093c18ac9b02b6716ce1013ca2c1174e319c1a570215bc9ab5f'
+    '7564765f7be20524dc3fdf8aa356fd94d445e05ab165ad8bb4a0db096c097618c81098f91443c719416d39837af6de85'
+    '015dca0de89462b1d8386758b2cf8a99e00953b308032ae44c35e05eb71842922eb69797f68813b59caf266cb6c21356'
+    '9ae3280505421a7e3a0a37fdf8e2ea354fc5422816655394a9454bac542a9298f176e211020d63dee6852c40de02267e'
+    '2fc9d5e1ff2ad9309506f02a1a71a0501b16d0d36f70cdfd8de78116c0c506ee0b8ddfdeb561acadf31746b5a9dd32c2'
+    '1930884397fb1682164cb565cc14e089d66635a32618f7eb05fe05082b8a3fae620571660a6b89886eac53dec109d7cb'
+    'b6930ca698a168f301a950be152da1be2b9e07516995e20baceebecb5579d7cdbc16d09f3a50cb3c7dffe33f26686d4f'
+    'f3f8946ee6475e98cf7b3cf9062b6966e838f865ff3de5fb064a37a21da7bb8dfd2501a29e184f207caaba364f36f232'
+    '9a77515dcb710e29ffbf73e2bbd773fab1f9a6b005567affff605c132e4e4dd69f36bd201005458cfbd2c658701eb2a7'
+    '00251cefd886b1e674ae816d3f719bac64be649c172ba27a4fd55947d95d53ba4cbc73de97b8af5ed4840b659370c556'
+    'e7376457f51e5ebb66018849923db82c1c9a819f173cccdb8f3324b239609a300018d0fb094adf5bd7cbb3834c69e6d0'
+    'b3798065c525b20f040e965e1a161af78ff7561cd874f5f1b75aa0bc77f720589e1b810f831eac5073e6dd46d00a2793'
+    'f70f7427f0f798f2f53a67e615e65d356e66fe40609a958a05edb4c175bcc383ea0530e67ddbe479a898943c6e3074c6'
+    'fcc252d6014de3a3d292b03f0d88d312fe221be7be7e3c59d07fa0f2f4029e364f1f355c5d01fa53770d0cd76d82bf7e'
+    '60f6903bc1beb772e6fde4a70be51d9c7e03c8d6d8dfb361a234ba47c470fe630820bbd920715621b9fbedb49fcee165'
+    'ead0875e6c2b1af16f50b5d6140cc981122fcbcf7c5a4e3772b3661b628e08380abc545957e59f634705b1bbde2f0b4e'
+    '055a5ec5676d859be77e20962b645e051a880fddb0180b4555789e1f9344a436a84dc5579e2553f1e5fb0a599c137be3'
+    '6cabbed0319831fea3fddf94ddc7971e4bcf02cdc93294a9aab3e3b13e3b058235b4f4ec06ba4ceaa49d675b4ba80716'
+    'f3bc6976b1fbf9c8bf1f3e3a4dc1cd83ef9cf816667fb94f1e923ff63fef072e6a19321e4812f96cb0ffa864da50ad74'
+    'deb76917a336f31dce03ed5f0303aad5e6a83634f9fcc371096f8288b8f02ddded5ff1bb9d49331e4a84dbe154316443'
+    '8fde9ad71dab024779dcdde0b6602b5ae0a6265c14b94edd83b37403f4b78fcd2ed555b596402c28ee81d87a909c4e87'
+    '22b30c71ecdd861b05f61f8b1231795c76adba2fdefa451b283a5d527955b9f3de1b9828e7b2e74123dd47062ddcc09b'
+    '05e7fa13cb2212a6fdbc65d7e852cec463ec6fd929f5b8483cf3052113b13dac91b69f49d1b7d1aec01c4a68e41ce157')
+
+def _pow_digest(header, nonce, n, k):
+    digest = blake2b_personalized(zcash_person(n, k), (512//n)*n//8)
+    digest.update(header)
+    hash_nonce(digest, nonce)
+    return digest
+
+class TestFrameworkEquihash(unittest.TestCase):
+    def validators(self):
+        if np is None:
+            return [gbp_validate_py]
+        return [gbp_validate_py, gbp_validate_np]
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_solver(self):
+        solved = 0
+        for nonce in range(32):
+            digest = _pow_digest(b'\x00' * 108, nonce, 48, 5)
+            solns = gbp_basic_py(digest.copy(), 48, 5)
+            self.assertEqual(gbp_basic_np(digest.copy(), 48, 5), solns)
+            for soln in solns:
+                self.assertTrue(gbp_validate_np(digest.copy(), soln, 48, 5))
+            solved += len(solns)
+        self.assertGreater(solved, 0)
+
+    def test_validate_mainnet_genesis(self):
+        digest = _pow_digest(MAINNET_GENESIS_HEADER, MAINNET_GENESIS_NONCE, 200, 9)
+        corrupted = bytearray(MAINNET_GENESIS_SOLUTION)
+        corrupted[len(corrupted) // 2] ^= 1
+        for validate in self.validators():
+            self.assertTrue(validate(digest.copy(), MAINNET_GENESIS_SOLUTION, 200, 9))
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertFalse(validate(digest.copy(), bytes(corrupted), 200, 9))
+                self.assertFalse(validate(digest.copy(), MAINNET_GENESIS_SOLUTION[:-1], 200, 9))
+                self.assertFalse(validate(
+                    _pow_digest(MAINNET_GENESIS_HEADER, MAINNET_GENESIS_NONCE + 1, 200, 9),
+                    MAINNET_GENESIS_SOLUTION, 200, 9))
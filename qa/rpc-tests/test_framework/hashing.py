@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Copyright (c) 2026 The Zcash developers
+# Distributed under the MIT software license, see the accompanying
+# file COPYING or https://www.opensource.org/licenses/mit-license.php .
+
+#
+# hashing.py
+#
+# Personalized BLAKE2b hashers shared by the hashing code in the test
+# framework (ZIP 243/244 digests, block commitments, history trees, and
+# Equihash).
+#
+# Constructing a personalized blake2b object is several times as expensive as
+# copying an existing one, and most of these digests are computed in loops
+# over a small set of personalizations. So one prototype hasher is created per
+# (personalization, digest size), and callers get copies of it.
+#
+
+import random
+import unittest
+from hashlib import blake2b
+
+_prototypes = {}
+
+def blake2b_personalized(person, digest_size=32):
+    '''
+    Return a new blake2b hasher with the given personalization and digest
+    size, equivalent to blake2b(digest_size=digest_size, person=person).
+    '''
+    try:
+        return _prototypes[(person, digest_size)].copy()
+    except KeyError:
+        prototype = blake2b(digest_size=digest_size, person=person)
+        _prototypes[(person, digest_size)] = prototype
+        return prototype.copy()
+
+def digest_many(person, chunks, digest_size=32):
+    '''
+    Return the personalized BLAKE2b digest of the concatenation of `chunks`,
+    an iterable of bytes-like objects.
+    '''
+    digest = blake2b_personalized(person, digest_size)
+    digest.update(b''.join(chunks))
+    return digest.digest()
+
+
+class TestFrameworkHashing(unittest.TestCase):
+    PERSONALIZATIONS = [
+        b'', b'ZcashTxHash_', b'ZTxIdHeadersHash', b'ZcashPoW\xc8\x00\x00\x00\x09\x00\x00\x00']
+
+    def test_blake2b_personalized(self):
+        rnd = random.Random(0)
+        for person in self.PERSONALIZATIONS:
+            for digest_size in (20, 32, 50, 64):
+                for length in (0, 1, 127, 128, 129, 1000):
+                    data = rnd.randbytes(length)
+                    direct = blake2b(data, digest_size=digest_size, person=person)
+                    # Each call returns an independent copy of the prototype.
+                    first = blake2b_personalized(person, digest_size)
+                    second = blake2b_personalized(person, digest_size)
+                    first.update(data)
+                    self.assertEqual(first.digest(), direct.digest())
+                    self.assertEqual(first.digest_size, digest_size)
+                    self.assertEqual(
+                        second.digest(), blake2b(digest_size=digest_size, person=person).digest())
+                self.assertEqual(
+                    blake2b_personalized(person).digest(), blake2b(digest_size=32, person=person).digest())
+
+    def test_digest_many(self):
+        rnd = random.Random(1)
+        for person in self.PERSONALIZATIONS:
+            for digest_size in (32, 64):
+                chunks = [rnd.randbytes(rnd.randrange(100)) for _ in range(rnd.randrange(10))]
+                self.assertEqual(
+                    digest_many(person, chunks, digest_size),
+                    blake2b(b''.join(chunks), digest_size=digest_size, person=person).digest())
+                self.assertEqual(
+                    digest_many(person, iter([bytearray(c) for c in chunks]), digest_size),
+                    blake2b(b''.join(chunks), digest_size=digest_size, person=person).digest())
+        self.assertEqual(
+            digest_many(b'ZcashTxHash_', []), blake2b(digest_size=32, person=b'ZcashTxHash_').digest())
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# Copyright (c) 2026 The Zcash developers
+# Distributed under the MIT software license, see the accompanying
+# file COPYING or https://www.opensource.org/licenses/mit-license.php .
+
+#
+# headerverify.py
+#
+# Verify the Equihash solutions and nBits targets of a range of block headers
+# across a pool of worker processes.
+#
+# The headers can come from RPC (getblockheader <hash> false), from REST, or
+# from a blk*.dat file. To audit headers from the command line, run e.g.
+#
+#   python3 -m test_framework.headerverify --hex headers.txt --start-height 1
+#
+# from the qa/rpc-tests directory.
+#
+
+import argparse
+import collections
+import contextlib
+import io
+import os
+import struct
+import sys
+import unittest
+from binascii import unhexlify
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .hashing import blake2b_personalized
+from .equihash import (
+    MAINNET_GENESIS_HEADER,
+    MAINNET_GENESIS_NONCE,
+    MAINNET_GENESIS_SOLUTION,
+    gbp_basic,
+    gbp_validate,
+    hash_nonce,
+    zcash_person,
+)
+from .mininode import CBlock, CBlockHeader, ser_char_vector, ser_uint256, uint256_from_compact
+
+MAINNET_EQUIHASH_PARAMS = (200, 9)
+REGTEST_EQUIHASH_PARAMS = (48, 5)
+
+# Number of headers sent to a worker process at a time.
+VERIFY_CHUNK_SIZE = 256
+
+# The most chunks per worker that verify_headers holds, running or waiting
+# to be yielded.
+MAX_PENDING_CHUNKS_PER_WORKER = 8
+
+def header_from_bytes(raw):
+    '''Deserialize a header from bytes or a hex string.'''
+    if isinstance(raw, str):
+        raw = unhexlify(raw.strip())
+    header = CBlockHeader()
+    header.deserialize(io.BytesIO(raw))
+    return header
+
+def header_error(raw, n, k):
+    '''
+    Check the Equihash solution and nBits target of a serialized header.
+    Return None if the header is valid, or a description of the problem.
+    '''
+    try:
+        header = header_from_bytes(raw)
+    except Exception as e:
+        return 'Undecodable header: %r' % e
+
+    # H(I||V||...
+    digest = blake2b_personalized(zcash_person(n, k), (512//n)*n//8)
+    digest.update(header.serialize()[:108])
+    hash_nonce(digest, header.nNonce)
+
+    # The validators describe the problem on stdout.
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        valid = gbp_validate(digest, header.nSolution, n, k)
+    if not valid:
+        return out.getvalue().strip() or 'Invalid Equihash solution'
+
+    header.calc_sha256()
+    if header.sha256 > uint256_from_compact(header.nBits):
+        return 'Block hash %s does not meet nBits target %08x' % (header.hash, header.nBits)
+    return None
+
+def _verify_chunk(n, k, start_height, raw_headers):
+    failures = []
+    for (i, raw) in enumerate(raw_headers):
+        error = header_error(raw, n, k)
+        if error is not None:
+            failures.append((start_height + i, error))
+    return failures
+
+def verify_headers(raw_headers, n=MAINNET_EQUIHASH_PARAMS[0], k=MAINNET_EQUIHASH_PARAMS[1],
+                   start_height=0, workers=None, chunk_size=VERIFY_CHUNK_SIZE):
+    '''
+    Verify a sequence of serialized headers (bytes or hex strings), the first
+    of which is at start_height, using `workers` processes (by default one
+    per CPU).
+
+    Each header's Equihash solution is checked, and its hash is checked
+    against the target of its own nBits. Whether nBits follows from the
+    difficulty adjustment over the previous headers is not verified.
+
+    Yields a (height, error) pair for every invalid header, in height order.
+    Headers are read from `raw_headers` lazily, a bounded number of chunks at
+    a time, so the sequence can be a generator over a whole chain.
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    headers = iter(raw_headers)
+    height = start_height
+    # Chunks submitted and not yet yielded, in height order.
+    pending = collections.deque()
+    exhausted = False
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            # Refill as chunks complete, keeping two chunks per worker
+            # running. Completed chunks wait behind the lowest running one,
+            # up to a bound, so that memory use does not grow with the
+            # length of the chain.
+            running = [f for f in pending if not f.done()]
+            while not exhausted and len(running) < 2*workers and \
+                    len(pending) < MAX_PENDING_CHUNKS_PER_WORKER*workers:
+                chunk = [raw for (_, raw) in zip(range(chunk_size), headers)]
+                if not chunk:
+                    exhausted = True
+                    break
+                f = executor.submit(_verify_chunk, n, k, height, chunk)
+                pending.append(f)
+                running.append(f)
+                height += len(chunk)
+            if not pending:
+                return
+            if pending[0].done():
+                yield from pending.popleft().result()
+            else:
+                wait(running, return_when=FIRST_COMPLETED)
+
+def headers_from_rpc(node, start_height, end_height):
+    '''Serialized headers for heights [start_height, end_height) of a node.'''
+    for height in range(start_height, end_height):
+        yield node.getblockheader(node.getblockhash(height), False)
+
+def headers_from_block_file(f):
+    '''
+    Serialized headers of the blocks in a blk*.dat file, in file order. Each
+    block is preceded by the 4-byte network magic and its 4-byte length.
+    '''
+    while True:
+        prefix = f.read(8)
+        if len(prefix) < 8 or prefix[:4] == b'\x00\x00\x00\x00':
+            return
+        (length,) = struct.unpack('<I', prefix[4:])
+        block = f.read(length)
+        header = header_from_bytes(block)
+        yield header.serialize()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Verify the Equihash solutions and nBits targets of block headers.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--hex', metavar='FILE',
+                        help='file of hex-encoded headers, one per line ("-" for stdin)')
+    source.add_argument('--blk', metavar='FILE', help='blk*.dat file to read headers from')
+    parser.add_argument('--start-height', type=int, default=0,
+                        help='height of the first header (default: 0)')
+    parser.add_argument('--regtest', action='store_true',
+                        help='use regtest Equihash parameters (%d,%d) instead of (%d,%d)'
+                        % (REGTEST_EQUIHASH_PARAMS + MAINNET_EQUIHASH_PARAMS))
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    (n, k) = REGTEST_EQUIHASH_PARAMS if args.regtest else MAINNET_EQUIHASH_PARAMS
+    if args.hex is not None:
+        f = sys.stdin if args.hex == '-' else open(args.hex, encoding='utf8')
+        headers = (line for line in f if line.strip())
+    else:
+        f = open(args.blk, 'rb')
+        headers = headers_from_block_file(f)
+
+    failures = 0
+    with f:
+        for (height, error) in verify_headers(headers, n, k, args.start_height, args.workers):
+            print('%d: %s' % (height, error))
+            failures += 1
+    print('%d invalid header(s)' % failures)
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
+
+
+class TestFrameworkHeaderVerify(unittest.TestCase):
+    def solved_header(self, nTime):
+        block = CBlock()
+        block.nBits = 0x200f0f0f
+        block.nTime = nTime
+        block.solve()
+        return CBlockHeader(block).serialize()
+
+    def corrupted(self, raw):
+        raw = bytearray(raw)
+        raw[-1] ^= 1
+        return bytes(raw)
+
+    def above_target(self):
+        # A valid Equihash solution whose hash does not meet nBits.
+        header = CBlockHeader()
+        header.nBits = 0x1f07ffff
+        prefix = header.serialize()[:108]
+        for nonce in range(256):
+            digest = blake2b_personalized(zcash_person(48, 5), (512//48)*48//8)
+            digest.update(prefix)
+            hash_nonce(digest, nonce)
+            for soln in gbp_basic(digest, 48, 5):
+                header.nNonce = nonce
+                header.nSolution = soln
+                header.calc_sha256()
+                if header.sha256 > uint256_from_compact(header.nBits):
+                    return header.serialize()
+        self.fail('no solution found')
+
+    def test_header_error(self):
+        genesis = MAINNET_GENESIS_HEADER + ser_uint256(MAINNET_GENESIS_NONCE) + \
+            ser_char_vector(MAINNET_GENESIS_SOLUTION)
+        self.assertIsNone(header_error(genesis, 200, 9))
+        self.assertIsNone(header_error(genesis.hex(), 200, 9))
+        self.assertIsNotNone(header_error(self.corrupted(genesis), 200, 9))
+        self.assertIsNotNone(header_error(genesis[:100], 200, 9))
+        self.assertIn('does not meet nBits target', header_error(self.above_target(), 48, 5))
+
+    def test_verify_headers(self):
+        headers = [self.solved_header(t) for t in range(8)]
+        headers[2] = self.corrupted(headers[2])
+        headers[5] = self.above_target()
+        headers[6] = self.corrupted(headers[6]).hex()
+        expected = [10 + i for i in (2, 5, 6)]
+        for workers in (1, 2):
+            for chunk_size in (1, 3, 256):
+                failures = list(verify_headers(
+                    iter(headers), 48, 5, start_height=10,
+                    workers=workers, chunk_size=chunk_size))
+                self.assertEqual([height for (height, _) in failures], expected)
+        self.assertEqual(list(verify_headers([], 48, 5, workers=1)), [])
+
+    def test_headers_from_block_file(self):
+        blocks = []
+        for t in range(3):
+            block = CBlock()
+            block.nBits = 0x200f0f0f
+            block.nTime = t
+            block.solve()
+            blocks.append(block)
+        blk = io.BytesIO(b''.join(
+            b'\xaa\xe8\x3f\x5f' + struct.pack('<I', len(b)) + b
+            for b in (block.serialize() for block in blocks)) + bytes(8))
+        self.assertEqual(
+            list(headers_from_block_file(blk)),
+            [CBlockHeader(block).serialize() for block in blocks])
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# Copyright (c) 2026 The Zcash developers
+# Distributed under the MIT software license, see the accompanying
+# file COPYING or https://www.opensource.org/licenses/mit-license.php .
+
+#
+# historystore.py
+#
+# HistoryStore: ZIP 221 history trees kept on disk, for chains too long to
+#               hold as ZcashMMRNode objects. The nodes of every epoch's tree
+#               are fixed-size records in one memory-mapped, append-only file,
+#               in the order they were added; a small log records where each
+#               epoch (consensus branch) starts. Nodes are only decoded when
+#               they are needed, and a store can be reopened to resume
+#               appending.
+#
+
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from typing import List, NamedTuple, Optional
+
+from .flyclient import (
+    ZcashMMR,
+    ZcashMMRNode,
+    make_parent,
+    make_root_commitment,
+    mmr_size,
+    peak_positions,
+)
+from .mininode import ser_uint256, uint256_from_str
+
+NODES_FILENAME = 'nodes.dat'
+EPOCHS_FILENAME = 'epochs.log'
+
+NODES_MAGIC = b'zcashmmr'
+
+# magic, record size, number of nodes
+HEADER = struct.Struct('<8sIQ')
+
+# hashSubtreeCommitment, nEarliestTimestamp, nLatestTimestamp,
+# nEarliestTargetBits, nLatestTargetBits, hashEarliestSaplingRoot,
+# hashLatestSaplingRoot, nSubTreeTotalWork, nEarliestHeight, nLatestHeight,
+# nSaplingTxCount, has Orchard fields, hashEarliestOrchardRoot,
+# hashLatestOrchardRoot, nOrchardTxCount
+RECORD = struct.Struct('<32sIIII32s32s32sIIQ?32s32sQ')
+
+# Grow the nodes file by at least this many records at a time.
+MIN_GROWTH = 4096
+
+class Epoch(NamedTuple):
+    consensusBranchId: int
+    first_height: int
+    first_node: int
+
+def _encode_node(node: ZcashMMRNode) -> bytes:
+    v2 = node.hashEarliestOrchardRoot is not None
+    return RECORD.pack(
+        node.hashSubtreeCommitment,
+        node.nEarliestTimestamp,
+        node.nLatestTimestamp,
+        node.nEarliestTargetBits,
+        node.nLatestTargetBits,
+        node.hashEarliestSaplingRoot,
+        node.hashLatestSaplingRoot,
+        ser_uint256(node.nSubTreeTotalWork),
+        node.nEarliestHeight,
+        node.nLatestHeight,
+        node.nSaplingTxCount,
+        v2,
+        node.hashEarliestOrchardRoot if v2 else b'\x00' * 32,
+        node.hashLatestOrchardRoot if v2 else b'\x00' * 32,
+        node.nOrchardTxCount if v2 else 0)
+
+def _decode_node(record: bytes, consensusBranchId: int) -> ZcashMMRNode:
+    fields = RECORD.unpack(record)
+    node = ZcashMMRNode()
+    node.left_child = None
+    node.right_child = None
+    (node.hashSubtreeCommitment,
+     node.nEarliestTimestamp,
+     node.nLatestTimestamp,
+     node.nEarliestTargetBits,
+     node.nLatestTargetBits,
+     node.hashEarliestSaplingRoot,
+     node.hashLatestSaplingRoot,
+     work,
+     node.nEarliestHeight,
+     node.nLatestHeight,
+     node.nSaplingTxCount,
+     v2,
+     orchard_earliest,
+     orchard_latest,
+     orchard_tx_count) = fields
+    node.nSubTreeTotalWork = uint256_from_str(work)
+    if v2:
+        node.hashEarliestOrchardRoot = orchard_earliest
+        node.hashLatestOrchardRoot = orchard_latest
+        node.nOrchardTxCount = orchard_tx_count
+    else:
+        node.hashEarliestOrchardRoot = None
+        node.hashLatestOrchardRoot = None
+        node.nOrchardTxCount = None
+    node.consensusBranchId = consensusBranchId
+    return node
+
+def _leaves_for_size(size: int) -> int:
+    # Invert mmr_size, which is increasing.
+    (lo, hi) = (0, size)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if mmr_size(mid) < size:
+            lo = mid + 1
+        else:
+            hi = mid
+    if mmr_size(lo) != size:
+        raise ValueError('%d is not the size of a history tree' % size)
+    return lo
+
+class HistoryStore():
+    '''
+    The history trees of a chain, stored in the directory `path`.
+
+    Leaves are appended in height order; a leaf whose consensusBranchId
+    differs from the current epoch's starts the tree of a new epoch, as at a
+    network upgrade. delete() removes the last leaf (and the last epoch, if
+    it becomes empty), to follow reorgs.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        nodes_path = os.path.join(path, NODES_FILENAME)
+        if not os.path.exists(nodes_path):
+            with open(nodes_path, 'wb') as f:
+                f.write(HEADER.pack(NODES_MAGIC, RECORD.size, 0))
+        self._file = open(nodes_path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        (magic, record_size, self.n_nodes) = HEADER.unpack_from(self._map, 0)
+        if magic != NODES_MAGIC or record_size != RECORD.size:
+            raise ValueError('%s is not a history tree store' % nodes_path)
+
+        # Epochs that were logged after the last node that was written (for
+        # example, by a process that was killed mid-append) are dropped.
+        self.epochs: List[Epoch] = []
+        epochs_path = os.path.join(path, EPOCHS_FILENAME)
+        if os.path.exists(epochs_path):
+            with open(epochs_path, encoding='utf8') as f:
+                for line in f:
+                    (branch_id, first_height, first_node) = line.split()
+                    epoch = Epoch(int(branch_id, 16), int(first_height), int(first_node))
+                    if epoch.first_node < self.n_nodes:
+                        self.epochs.append(epoch)
+        self._rewrite_epochs()
+        self._epoch_leaves = self._count_epoch_leaves()
+        self._root: Optional[ZcashMMRNode] = None
+
+    def close(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _rewrite_epochs(self):
+        tmp = os.path.join(self.path, EPOCHS_FILENAME + '.tmp')
+        with open(tmp, 'w', encoding='utf8') as f:
+            for epoch in self.epochs:
+                f.write('%08x %d %d\n' % epoch)
+        os.replace(tmp, os.path.join(self.path, EPOCHS_FILENAME))
+
+    def _count_epoch_leaves(self) -> int:
+        if not self.epochs:
+            return 0
+        return _leaves_for_size(self.n_nodes - self.epochs[-1].first_node)
+
+    def __len__(self) -> int:
+        '''The number of leaves in the current epoch's tree.'''
+        return self._epoch_leaves
+
+    @property
+    def tip_height(self) -> Optional[int]:
+        '''The height of the last leaf, or None if the store is empty.'''
+        if not self.epochs:
+            return None
+        return self.epochs[-1].first_height + self._epoch_leaves - 1
+
+    def _epoch_of(self, index: int) -> Epoch:
+        for epoch in reversed(self.epochs):
+            if epoch.first_node <= index:
+                return epoch
+        raise IndexError('node index out of range')
+
+    def node(self, index: int) -> ZcashMMRNode:
+        '''Decode the node at index (counting from the first epoch).'''
+        if not 0 <= index < self.n_nodes:
+            raise IndexError('node index out of range')
+        offset = HEADER.size + index * RECORD.size
+        return _decode_node(
+            self._map[offset:offset + RECORD.size],
+            self._epoch_of(index).consensusBranchId)
+
+    def _write_nodes(self, nodes: List[ZcashMMRNode]):
+        end = HEADER.size + (self.n_nodes + len(nodes)) * RECORD.size
+        if end > len(self._map):
+            capacity = max(end, 2 * len(self._map),
+                           HEADER.size + (self.n_nodes + MIN_GROWTH) * RECORD.size)
+            self._map.close()
+            self._file.truncate(capacity)
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        offset = HEADER.size + self.n_nodes * RECORD.size
+        self._map[offset:end] = b''.join(_encode_node(node) for node in nodes)
+        # Publish the nodes only once they are all written.
+        self._set_node_count(self.n_nodes + len(nodes))
+
+    def _set_node_count(self, n_nodes: int):
+        self.n_nodes = n_nodes
+        HEADER.pack_into(self._map, 0, NODES_MAGIC, RECORD.size, n_nodes)
+
+    def _peaks(self) -> List[int]:
+        first_node = self.epochs[-1].first_node
+        return [first_node + pos for pos in peak_positions(self._epoch_leaves)]
+
+    def append(self, leaf: ZcashMMRNode):
+        '''Append the leaf for the block after the tip.'''
+        if self.epochs and self.tip_height + 1 != leaf.nLatestHeight:
+            raise ValueError('expected the leaf for height %d, got %d'
+                             % (self.tip_height + 1, leaf.nLatestHeight))
+        if not self.epochs or self.epochs[-1].consensusBranchId != leaf.consensusBranchId:
+            self.epochs.append(Epoch(leaf.consensusBranchId, leaf.nLatestHeight, self.n_nodes))
+            self._rewrite_epochs()
+            self._epoch_leaves = 0
+
+        # The rightmost peaks, one per trailing one bit of the leaf count,
+        # merge with the new leaf.
+        peaks = self._peaks()
+        new_nodes = [leaf]
+        current = leaf
+        current_serialized = leaf.serialize()
+        n = self._epoch_leaves
+        while n & 1:
+            left = self.node(peaks.pop())
+            current = make_parent(left, current, left.serialize() + current_serialized)
+            current_serialized = current.serialize()
+            new_nodes.append(current)
+            n >>= 1
+        self._write_nodes(new_nodes)
+        self._epoch_leaves += 1
+        self._root = None
+
+    def extend(self, leaves):
+        for leaf in leaves:
+            self.append(leaf)
+
+    def delete(self):
+        '''Delete the leaf at the tip, to roll back a block.'''
+        if not self.epochs:
+            raise IndexError('delete from an empty history store')
+        self._epoch_leaves -= 1
+        if self._epoch_leaves == 0:
+            self._set_node_count(self.epochs.pop().first_node)
+            self._rewrite_epochs()
+            self._epoch_leaves = self._count_epoch_leaves()
+        else:
+            self._set_node_count(self.epochs[-1].first_node + mmr_size(self._epoch_leaves))
+        self._root = None
+
+    def root(self) -> ZcashMMRNode:
+        '''The root of the current epoch's tree (without its children).'''
+        if not self.epochs:
+            raise IndexError('empty history store has no root')
+        if self._root is None:
+            peaks = self._peaks()
+            root = self.node(peaks[0])
+            for pos in peaks[1:]:
+                root = make_parent(root, self.node(pos))
+            self._root = root
+        return self._root
+
+    def root_commitment(self) -> bytes:
+        '''
+        The hashChainHistoryRoot of the block after the tip. That is the
+        commitment to the current epoch's tree even if the block activates a
+        network upgrade and starts a new epoch.
+        '''
+        return make_root_commitment(self.root())
+
+    def flush(self):
+        self._map.flush()
+
+class TestFrameworkHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='historystore')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def leaf(self, height, consensusBranchId):
+        return ZcashMMRNode._leaf(
+            bytes([height % 256]) * 32, 1600000000 + height, 0x200f0f0f, height,
+            bytes(32), 0, None, None, consensusBranchId)
+
+    def test_epochs(self):
+        (first, second) = (0xf5b9230b, 0xe9ff75a6)
+        first_leaves = [self.leaf(h, first) for h in range(10, 17)]
+        second_leaves = [self.leaf(h, second) for h in range(17, 20)]
+        with HistoryStore(self.tmpdir) as store:
+            store.extend(first_leaves)
+            # The activation block of the second epoch commits to the final
+            # tree of the first.
+            activation_commitment = ZcashMMR(first_leaves).root_commitment()
+            self.assertEqual(store.root_commitment(), activation_commitment)
+            for (i, leaf) in enumerate(second_leaves):
+                store.append(leaf)
+                self.assertEqual(len(store), i + 1)
+                self.assertEqual(
+                    store.root_commitment(),
+                    ZcashMMR(second_leaves[:i + 1]).root_commitment())
+            self.assertEqual(store.tip_height, 19)
+
+            store.delete()
+            store.delete()
+            store.delete()
+            self.assertEqual(store.tip_height, 16)
+            self.assertEqual(store.root_commitment(), activation_commitment)
+
+        # Reopening the store resumes the last epoch.
+        with HistoryStore(self.tmpdir) as store:
+            self.assertEqual(store.root_commitment(), activation_commitment)
+            store.extend(second_leaves)
+            self.assertEqual(
+                store.root_commitment(), ZcashMMR(second_leaves).root_commitment())
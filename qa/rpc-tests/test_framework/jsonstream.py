@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# Copyright (c) 2026 The Zcash developers
+# Distributed under the MIT software license, see the accompanying
+# file COPYING or https://www.opensource.org/licenses/mit-license.php .
+
+#
+# jsonstream.py
+#
+# JSONArrayStream: decode the elements of one array in a JSON document as
+#     the document is read from a file-like object, one element at a time.
+#     Only the element being decoded is held in memory (plus a read buffer),
+#     so a response with a huge array, such as the transactions of a block
+#     or the UTXOs of a large wallet, can be processed in bounded memory.
+#
+#     The array is found by a path of object keys from the top level; the
+#     other members of the objects along the path are decoded as usual and
+#     kept in `document` (with None in place of the array), which is
+#     complete once the stream is exhausted.
+#     Numbers that look like floats are parsed as Decimal, as by
+#     AuthServiceProxy.
+#
+
+import codecs
+import decimal
+import io
+import re
+import simplejson as json
+import unittest
+
+READ_SIZE = 64 * 1024
+
+_NON_WHITESPACE = re.compile(r'[^ \t\n\r]')
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[ \t\n\r,\]}]')
+
+class JSONStreamError(ValueError):
+    pass
+
+class JSONArrayStream():
+    '''
+    An iterator over the elements of the array at `path` (a sequence of
+    object keys) in the JSON document read from `fp`. If the value at the
+    path is null, or a key of the path is missing, there are no elements.
+    '''
+
+    def __init__(self, fp, path=(), read_size=READ_SIZE, parse_float=decimal.Decimal):
+        self.fp = fp
+        self.path = tuple(path)
+        self.read_size = read_size
+        self.parse_float = parse_float
+        self.document = None
+        self.n_read = 0
+        self._decoder = codecs.getincrementaldecoder('utf8')()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        # While a value is being captured, the text of it that has already
+        # been dropped from the buffer, and where it starts in the buffer.
+        self._pieces = None
+        self._mark = 0
+        self._items = self._generate()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._items)
+
+    def close(self):
+        self._items.close()
+
+    # Reading
+
+    def _fill(self):
+        '''Replace the consumed buffer with the next chunk; False at EOF.'''
+        if self._eof:
+            return False
+        if self._pieces is not None:
+            self._pieces.append(self._buf[self._mark:])
+            self._mark = 0
+        while True:
+            data = self.fp.read(self.read_size)
+            self.n_read += len(data)
+            text = self._decoder.decode(data, final=not data)
+            if not data:
+                self._eof = True
+            if text or self._eof:
+                break
+        self._buf = text
+        self._pos = 0
+        return bool(text)
+
+    def _peek(self):
+        '''The next non-whitespace character, without consuming it.'''
+        while True:
+            m = _NON_WHITESPACE.search(self._buf, self._pos)
+            if m is not None:
+                self._pos = m.start()
+                return m.group()
+            self._pos = len(self._buf)
+            if not self._fill():
+                return ''
+
+    def _expect(self, chars):
+        c = self._peek()
+        if c == '' or c not in chars:
+            raise JSONStreamError('expected one of %r, got %r' % (chars, c or 'EOF'))
+        self._pos += 1
+        return c
+
+    def _scan_value(self):
+        # Move past one complete value, starting at a non-whitespace char.
+        c = self._peek()
+        if c == '':
+            raise JSONStreamError('unexpected EOF')
+        if c not in '"{[':
+            while True:
+                m = _SCALAR_END.search(self._buf, self._pos)
+                if m is not None:
+                    self._pos = m.start()
+                    return
+                self._pos = len(self._buf)
+                if not self._fill():
+                    return
+        depth = 0
+        in_string = False
+        escape = False
+        while True:
+            if self._pos == len(self._buf) and not self._fill():
+                raise JSONStreamError('unexpected EOF')
+            if in_string:
+                if escape:
+                    self._pos += 1
+                    escape = False
+                    continue
+                m = _STRING_SPECIAL.search(self._buf, self._pos)
+                if m is None:
+                    self._pos = len(self._buf)
+                    continue
+                self._pos = m.end()
+                if m.group() == '\\':
+                    escape = True
+                else:
+                    in_string = False
+                    if depth == 0:
+                        return
+            else:
+                m = _STRUCTURAL.search(self._buf, self._pos)
+                if m is None:
+                    self._pos = len(self._buf)
+                    continue
+                self._pos = m.end()
+                ch = m.group()
+                if ch == '"':
+                    in_string = True
+                elif ch in '{[':
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        return
+
+    def _read_value(self):
+        '''Decode the next value.'''
+        self._peek()
+        self._pieces = []
+        self._mark = self._pos
+        try:
+            self._scan_value()
+            self._pieces.append(self._buf[self._mark:self._pos])
+            text = ''.join(self._pieces)
+        finally:
+            self._pieces = None
+        try:
+            return json.loads(text, parse_float=self.parse_float)
+        except ValueError as e:
+            raise JSONStreamError(str(e))
+
+    def _members(self, container):
+        # Yield the keys of the object being read, decoding into container
+        # the values of the members that the caller does not take.
+        if self._expect('{') and self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._read_value()
+            if not isinstance(key, str):
+                raise JSONStreamError('object key is not a string')
+            self._expect(':')
+            taken = yield key
+            if not taken:
+                container[key] = self._read_value()
+            if self._expect(',}') == '}':
+                return
+
+    # Decoding
+
+    def _generate(self):
+        if not self.path:
+            yield from self._array()
+        elif self._peek() == 'n':
+            self.document = self._read_value()
+        else:
+            self.document = {}
+            yield from self._descend(self.path, self.document)
+        if self._peek() != '':
+            raise JSONStreamError('extra data after the document')
+
+    def _descend(self, path, container):
+        # Read the object at the read position into container, streaming
+        # the array at path within it. The array itself is left as None.
+        members = self._members(container)
+        try:
+            key = next(members)
+            while True:
+                if key != path[0]:
+                    key = members.send(False)
+                    continue
+                if len(path) == 1:
+                    container[key] = None
+                    yield from self._array()
+                elif self._peek() == 'n':
+                    container[key] = self._read_value()
+                else:
+                    container[key] = {}
+                    yield from self._descend(path[1:], container[key])
+                key = members.send(True)
+        except StopIteration:
+            pass
+
+    def _array(self):
+        if self._peek() == 'n':
+            self._read_value()
+            return
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._read_value()
+            if self._expect(',]') == ']':
+                return
+
+
+class TestFrameworkJSONStream(unittest.TestCase):
+    READ_SIZES = [1, 2, 3, 7, READ_SIZE]
+
+    def stream(self, text, path=(), read_size=READ_SIZE):
+        return JSONArrayStream(io.BytesIO(text.encode('utf8')), path, read_size)
+
+    def check(self, text, path):
+        # The elements and the document agree with json.loads at every
+        # read size.
+        expected = json.loads(text, parse_float=decimal.Decimal)
+        document = expected
+        for key in path[:-1]:
+            document = (document or {}).get(key)
+        items = []
+        if isinstance(document, dict) and path[-1] in document:
+            items = document[path[-1]] or []
+            document[path[-1]] = None
+        for read_size in self.READ_SIZES:
+            stream = self.stream(text, path, read_size)
+            self.assertEqual(list(stream), items)
+            self.assertEqual(stream.document, expected)
+            self.assertEqual(stream.n_read, len(text.encode('utf8')))
+
+    def test_elements(self):
+        text = json.dumps({
+            'before': {'s': 'a "quoted" [bracket] {brace}', 'n': [1, [2, {}]]},
+            'result': {
+                'tx': [
+                    'plain',
+                    'esc\\aped \\" \\\\ \\u005d ]',
+                    {'k': '\\', 'l': ['}', ']', '"', '[', '{']},
+                    [], {}, [[[]]], 1, -2.5e-3, 0.1, True, False, None,
+                    'caf\u00e9 \u2603 \U0001f600',
+                ],
+                'after': '"]}',
+            },
+            'id': 1,
+        }, ensure_ascii=False)
+        self.check(text, ('result', 'tx'))
+
+        # The elements of a top-level array.
+        for read_size in self.READ_SIZES:
+            self.assertEqual(
+                list(self.stream(' [ 1 , "]" , {"a": [2]} ] ', (), read_size)),
+                [1, ']', {'a': [2]}])
+            self.assertEqual(list(self.stream('[]', (), read_size)), [])
+        self.assertEqual(list(self.stream('[0.1]')), [decimal.Decimal('0.1')])
+
+    def test_null_and_missing(self):
+        self.check('{"result": null, "error": null, "id": 1}', ('result',))
+        self.check('{"result": {"tx": null}, "id": 1}', ('result', 'tx'))
+        self.check('{"result": null, "id": 1}', ('result', 'tx'))
+        self.check('{"error": {"code": -1}, "id": 1}', ('result', 'tx'))
+        self.check('{}', ('result',))
+        self.check('null', ('result',))
+        self.assertEqual(list(self.stream('null')), [])
+
+    def test_errors(self):
+        for (text, path) in [
+                ('[1, 2] x', ()),
+                ('[1, 2]]', ()),
+                ('{"result": [1]} {}', ('result',)),
+                ('[1, 2', ()),
+                ('[1 2]', ()),
+                ('["unterminated]', ()),
+                ('{"result": [1, tru]}', ('result',)),
+                ('{1: []}', ('result',)),
+                ('', ()),
+        ]:
+            for read_size in self.READ_SIZES:
+                with self.assertRaises(JSONStreamError, msg=text):
+                    list(self.stream(text, path, read_size))
+                with self.assertRaises(ValueError, msg=text):
+                    json.loads(text)
@@ -14,7 +14,11 @@ disk in swap! Use with caution!
 import ctypes
 import ctypes.util
 import hashlib
+import os
 import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 ssl = ctypes.cdll.LoadLibrary(ctypes.util.find_library ('ssl') or 'libeay32')
 
@@ -24,6 +28,9 @@ ssl.BN_new.argtypes = []
 ssl.BN_bin2bn.restype = ctypes.c_void_p
 ssl.BN_bin2bn.argtypes = [ctypes.c_char_p, ctypes.c_int, ctypes.c_void_p]
 
+ssl.BN_clear_free.restype = None
+ssl.BN_clear_free.argtypes = [ctypes.c_void_p]
+
 ssl.BN_CTX_free.restype = None
 ssl.BN_CTX_free.argtypes = [ctypes.c_void_p]
 
@@ -39,6 +46,9 @@ ssl.ECDSA_sign.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c
 ssl.ECDSA_verify.restype = ctypes.c_int
 ssl.ECDSA_verify.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p]
 
+ssl.ECDSA_size.restype = ctypes.c_int
+ssl.ECDSA_size.argtypes = [ctypes.c_void_p]
+
 ssl.EC_KEY_free.restype = None
 ssl.EC_KEY_free.argtypes = [ctypes.c_void_p]
 
@@ -85,6 +95,27 @@ def _check_result(val, func, args):
 ssl.EC_KEY_new_by_curve_name.restype = ctypes.c_void_p
 ssl.EC_KEY_new_by_curve_name.errcheck = _check_result
 
+# OpenSSL scratch space, one per thread. ctypes releases the GIL for the
+# duration of each call into OpenSSL, so keys can be used from several
+# threads at once, but a BN_CTX must not be shared between them.
+_thread_state = threading.local()
+
+def _bn_ctx():
+    try:
+        return _thread_state.bn_ctx.ctx
+    except AttributeError:
+        _thread_state.bn_ctx = _BNContext()
+        return _thread_state.bn_ctx.ctx
+
+class _BNContext(object):
+    def __init__(self):
+        self.ctx = ssl.BN_CTX_new()
+
+    def __del__(self):
+        if ssl:
+            ssl.BN_CTX_free(self.ctx)
+        self.ctx = None
+
 class CECKey(object):
     """Wrapper around OpenSSL's EC_KEY"""
 
@@ -100,17 +131,35 @@ class CECKey(object):
         self.k = None
 
     def set_secretbytes(self, secret):
-        priv_key = ssl.BN_bin2bn(secret, 32, ssl.BN_new())
+        # The secret is read as a big-endian number of len(secret) bytes.
+        priv_key = ssl.BN_bin2bn(secret, len(secret), None)
         group = ssl.EC_KEY_get0_group(self.k)
         pub_key = ssl.EC_POINT_new(group)
-        ctx = ssl.BN_CTX_new()
-        if not ssl.EC_POINT_mul(group, pub_key, priv_key, None, None, ctx):
-            raise ValueError("Could not derive public key from the supplied secret.")
-        ssl.EC_POINT_mul(group, pub_key, priv_key, None, None, ctx)
-        ssl.EC_KEY_set_private_key(self.k, priv_key)
-        ssl.EC_KEY_set_public_key(self.k, pub_key)
-        ssl.EC_POINT_free(pub_key)
-        ssl.BN_CTX_free(ctx)
+        try:
+            if not ssl.EC_POINT_mul(group, pub_key, priv_key, None, None, _bn_ctx()):
+                raise ValueError("Could not derive public key from the supplied secret.")
+            ssl.EC_KEY_set_private_key(self.k, priv_key)
+            ssl.EC_KEY_set_public_key(self.k, pub_key)
+        finally:
+            # EC_KEY_set_* take copies.
+            ssl.EC_POINT_free(pub_key)
+            ssl.BN_clear_free(priv_key)
+        return self.k
+
+    def set_keypair(self, secret, pubkey):
+        """Set a secret along with its encoded public key
+
+        This decodes the public key instead of deriving it from the secret,
+        which skips the point multiplication of set_secretbytes(). The key
+        pair is not checked.
+        """
+        if not self.set_pubkey(pubkey):
+            raise ValueError("Could not decode the supplied public key.")
+        priv_key = ssl.BN_bin2bn(secret, len(secret), None)
+        try:
+            ssl.EC_KEY_set_private_key(self.k, priv_key)
+        finally:
+            ssl.BN_clear_free(priv_key)
         return self.k
 
     def set_privkey(self, key):
@@ -213,3 +262,99 @@ class CPubKey(bytes):
         else:
             return '%s(b%s)' % (self.__class__.__name__, super(CPubKey, self).__repr__())
 
+
+def _map_chunks(f, args, workers):
+    # Apply f to each tuple in args across a pool of threads, a chunk of
+    # tuples per task, and return the results in order.
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(args) < 2:
+        return [f(*a) for a in args]
+    chunk_size = -(-len(args) // (4*workers))
+    chunks = [args[i:i+chunk_size] for i in range(0, len(args), chunk_size)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(lambda chunk: [f(*a) for a in chunk], chunks)
+        return [r for chunk in results for r in chunk]
+
+def _broadcast(keys, n):
+    if isinstance(keys, (CECKey, CPubKey)):
+        return [keys] * n
+    keys = list(keys)
+    if len(keys) != n:
+        raise ValueError('Expected %d keys; got %d' % (n, len(keys)))
+    return keys
+
+def sign_many(keys, hashes, workers=None):
+    """Sign many 32-byte hashes, using a pool of threads
+
+    keys is either a single CECKey to sign every hash with, or a sequence of
+    CECKeys, one per hash. Returns the DER signatures in order.
+    """
+    hashes = list(hashes)
+    keys = _broadcast(keys, len(hashes))
+    return _map_chunks(lambda key, hash: key.sign(hash), list(zip(keys, hashes)), workers)
+
+def verify_many(keys, hashes, sigs, workers=None):
+    """Verify many DER signatures, using a pool of threads
+
+    keys is either a single CECKey or CPubKey that made every signature, or
+    a sequence of them, one per signature. Returns a list of booleans.
+    """
+    hashes = list(hashes)
+    sigs = list(sigs)
+    if len(sigs) != len(hashes):
+        raise ValueError('Expected %d signatures; got %d' % (len(hashes), len(sigs)))
+    keys = _broadcast(keys, len(hashes))
+    return _map_chunks(
+        lambda key, hash, sig: key.verify(hash, sig),
+        list(zip(keys, hashes, sigs)), workers)
+
+
+class TestFrameworkKey(unittest.TestCase):
+    def test_secretbytes(self):
+        # The secret is the big-endian number in all of its bytes.
+        key = CECKey()
+        key.set_secretbytes(b'horsebattery')
+        self.assertEqual(key.get_pubkey().hex(),
+            '04fb9bc6ccd17221e5e2e46da8657f399443558171b027238ceff2a89cff1f6caf'
+            '7b0a7b75e1d25b1cd06a0bbf6b2d9f5ba1c6686a526e9827a9125050108b1db4')
+        key.set_secretbytes(b'\x01')
+        key.set_compressed(True)
+        self.assertEqual(key.get_pubkey().hex(),
+            '0279be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798')
+
+    def test_keypair(self):
+        derived = CECKey()
+        derived.set_secretbytes(b'horsebattery')
+        key = CECKey()
+        key.set_keypair(b'horsebattery', derived.get_pubkey())
+        self.assertEqual(key.get_pubkey(), derived.get_pubkey())
+        hash = hashlib.sha256(b'message').digest()
+        self.assertTrue(derived.verify(hash, key.sign(hash)))
+        with self.assertRaises(ValueError):
+            key.set_keypair(b'horsebattery', b'\x02' + b'\xff' * 32)
+
+    def test_sign_many(self):
+        keys = []
+        for i in range(3):
+            key = CECKey()
+            key.set_secretbytes(hashlib.sha256(bytes([i])).digest())
+            keys.append(key)
+        hashes = [hashlib.sha256(bytes([i])).digest() for i in range(30)]
+        signers = [keys[i % 3] for i in range(30)]
+        pubkeys = [CPubKey(key.get_pubkey()) for key in signers]
+        for workers in [1, 4]:
+            sigs = sign_many(signers, hashes, workers)
+            self.assertEqual(verify_many(pubkeys, hashes, sigs, workers), [True] * 30)
+            self.assertEqual(verify_many(keys[0], hashes, sigs, workers)[:3], [True, False, False])
+
+            # A flipped bit in a signature's r value is rejected.
+            flipped = bytearray(sigs[7])
+            flipped[10] ^= 1
+            sigs[7] = bytes(flipped)
+            self.assertEqual(verify_many(pubkeys, hashes, sigs, workers),
+                             [i != 7 for i in range(30)])
+
+        self.assertTrue(all(verify_many(keys[1], hashes, sign_many(keys[1], hashes))))
+        with self.assertRaises(ValueError):
+            sign_many(keys, hashes)
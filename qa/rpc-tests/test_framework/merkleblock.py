@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# Copyright (c) 2026 The Zcash developers
+# Distributed under the MIT software license, see the accompanying
+# file COPYING or https://www.opensource.org/licenses/mit-license.php .
+
+#
+# merkleblock.py
+#
+# CPartialMerkleTree, CMerkleBlock: the proofs returned by gettxoutproof and
+#     accepted by verifytxoutproof, which map to the corresponding structures
+#     in merkleblock.h
+# build_merkle_block: build a proof for any subset of a block's transactions
+# verify_merkle_blocks: check a batch of proofs against their headers
+#
+
+import random
+import struct
+import unittest
+from bisect import bisect_left
+from io import BytesIO
+
+from .merkletree import TxidMerkleTree
+from .mininode import (
+    CBlock,
+    CBlockHeader,
+    CTransaction,
+    deser_string,
+    hash256,
+    deser_uint256_vector,
+    ser_string,
+    ser_uint256,
+    ser_uint256_vector,
+    uint256_from_str,
+)
+from .util import bytes_to_hex_str, hex_str_to_bytes
+
+MAX_BLOCK_SIZE = 2000000
+
+# A lower bound on the size of a serialized transaction, used to bound the
+# number of transactions a proof may claim its block has.
+MIN_TRANSACTION_SIZE = 60
+
+class BadMerkleProof(Exception):
+    pass
+
+def _tree_height(n_transactions):
+    height = 0
+    while _tree_width(n_transactions, height) > 1:
+        height += 1
+    return height
+
+def _tree_width(n_transactions, height):
+    return (n_transactions + (1 << height) - 1) >> height
+
+class CPartialMerkleTree(object):
+    '''
+    A pruned txid Merkle tree: a depth-first list of flag bits, saying for
+    each node visited whether it is the ancestor of a matched transaction,
+    and the hashes of the nodes at which the traversal stopped.
+    '''
+
+    def __init__(self):
+        self.nTransactions = 0
+        self.vHash = []
+        self.vBits = []
+
+    def deserialize(self, f):
+        self.nTransactions = struct.unpack("<I", f.read(4))[0]
+        self.vHash = deser_uint256_vector(f)
+        packed = deser_string(f)
+        self.vBits = [bool(packed[i // 8] & (1 << (i % 8))) for i in range(len(packed) * 8)]
+
+    def serialize(self):
+        packed = bytearray((len(self.vBits) + 7) // 8)
+        for (i, bit) in enumerate(self.vBits):
+            if bit:
+                packed[i // 8] |= 1 << (i % 8)
+        r = b""
+        r += struct.pack("<I", self.nTransactions)
+        r += ser_uint256_vector(self.vHash)
+        r += ser_string(bytes(packed))
+        return r
+
+    @classmethod
+    def from_tree(cls, tree, matches):
+        '''
+        Build the partial tree for a TxidMerkleTree, keeping the paths to the
+        leaves at the indices in `matches`. The interior nodes are taken from
+        the tree rather than rehashed.
+        '''
+        matched = sorted(set(matches))
+        pmt = cls()
+        pmt.nTransactions = len(tree)
+        if pmt.nTransactions == 0:
+            raise ValueError('cannot build a proof for an empty block')
+        if matched and not 0 <= matched[0] <= matched[-1] < len(tree):
+            raise IndexError('transaction index out of range')
+
+        def parent_of_match(height, pos):
+            # Whether any matched leaf is in [pos << height, (pos+1) << height).
+            lo = pos << height
+            hi = (pos + 1) << height
+            i = bisect_left(matched, lo)
+            return i < len(matched) and matched[i] < hi
+
+        def traverse(height, pos):
+            is_parent = parent_of_match(height, pos)
+            pmt.vBits.append(is_parent)
+            if height == 0 or not is_parent:
+                pmt.vHash.append(uint256_from_str(tree.levels[height][pos]))
+            else:
+                traverse(height - 1, pos * 2)
+                if pos * 2 + 1 < _tree_width(pmt.nTransactions, height - 1):
+                    traverse(height - 1, pos * 2 + 1)
+
+        traverse(_tree_height(pmt.nTransactions), 0)
+        return pmt
+
+    def extract_matches(self, nodes=None):
+        '''
+        Recompute the root of the tree, and find the matched transactions.
+        Return (root, [(index, txid), ...]) with root as a uint256, or raise
+        BadMerkleProof if the tree is malformed.
+
+        `nodes` is an optional dict of interior nodes, keyed by the pair of
+        children they are the hash of, shared between calls so that subtrees
+        common to several proofs are only hashed once.
+        '''
+        if nodes is None:
+            nodes = {}
+        if self.nTransactions == 0:
+            raise BadMerkleProof('no transactions')
+        if self.nTransactions > MAX_BLOCK_SIZE // MIN_TRANSACTION_SIZE:
+            raise BadMerkleProof('too many transactions')
+        if len(self.vHash) > self.nTransactions:
+            raise BadMerkleProof('more hashes than transactions')
+        if len(self.vBits) < len(self.vHash):
+            raise BadMerkleProof('fewer flag bits than hashes')
+
+        bits = iter(self.vBits)
+        hashes = iter(self.vHash)
+        matches = []
+        used = [0, 0]
+        combine = TxidMerkleTree().combine
+
+        def traverse(height, pos):
+            is_parent = next(bits, None)
+            if is_parent is None:
+                raise BadMerkleProof('ran out of flag bits')
+            used[0] += 1
+            if height == 0 or not is_parent:
+                h = next(hashes, None)
+                if h is None:
+                    raise BadMerkleProof('ran out of hashes')
+                used[1] += 1
+                h = ser_uint256(h)
+                if height == 0 and is_parent:
+                    matches.append((pos, uint256_from_str(h)))
+                return h
+            left = traverse(height - 1, pos * 2)
+            if pos * 2 + 1 < _tree_width(self.nTransactions, height - 1):
+                right = traverse(height - 1, pos * 2 + 1)
+                # Two identical children would allow a block with duplicated
+                # transactions to have the same root (CVE-2012-2459).
+                if right == left:
+                    raise BadMerkleProof('identical left and right branches')
+            else:
+                right = left
+            try:
+                return nodes[(left, right)]
+            except KeyError:
+                node = combine(left, right)
+                nodes[(left, right)] = node
+                return node
+
+        root = traverse(_tree_height(self.nTransactions), 0)
+        if (used[0] + 7) // 8 != (len(self.vBits) + 7) // 8:
+            raise BadMerkleProof('not all flag bits were consumed')
+        if used[1] != len(self.vHash):
+            raise BadMerkleProof('not all hashes were consumed')
+        return (uint256_from_str(root), matches)
+
+    def __repr__(self):
+        return "CPartialMerkleTree(nTransactions=%d vHash=%d vBits=%d)" \
+            % (self.nTransactions, len(self.vHash), len(self.vBits))
+
+
+class CMerkleBlock(object):
+    def __init__(self, header=None, txn=None):
+        self.header = CBlockHeader(header)
+        self.txn = CPartialMerkleTree() if txn is None else txn
+
+    def deserialize(self, f):
+        self.header.deserialize(f)
+        self.txn.deserialize(f)
+
+    def serialize(self):
+        r = b""
+        r += self.header.serialize()
+        r += self.txn.serialize()
+        return r
+
+    def __repr__(self):
+        return "CMerkleBlock(header=%r txn=%r)" % (self.header, self.txn)
+
+
+def build_merkle_block(block, txids):
+    '''
+    Build the CMerkleBlock proving that the transactions with the given txids
+    (as uint256s) are in `block`, as gettxoutproof does. The block's cached
+    txid tree is reused, so building many proofs from one block only hashes
+    the tree once.
+    '''
+    block.calc_merkle_root()
+    positions = {}
+    for (i, tx) in enumerate(block.vtx):
+        positions.setdefault(tx.sha256, i)
+    try:
+        matches = [positions[txid] for txid in txids]
+    except KeyError as e:
+        raise ValueError('transaction %064x is not in the block' % e.args[0])
+    return CMerkleBlock(block, CPartialMerkleTree.from_tree(block.merkle_tree, matches))
+
+def merkle_block_from_hex(proof):
+    '''Deserialize a proof returned by gettxoutproof.'''
+    merkle_block = CMerkleBlock()
+    merkle_block.deserialize(BytesIO(hex_str_to_bytes(proof)))
+    return merkle_block
+
+def merkle_block_to_hex(merkle_block):
+    '''Serialize a proof for verifytxoutproof.'''
+    return bytes_to_hex_str(merkle_block.serialize())
+
+def verify_merkle_blocks(merkle_blocks):
+    '''
+    Verify a batch of CMerkleBlocks, and return for each the list of txids
+    (as uint256s) it proves, in block order, as verifytxoutproof does.
+    Raise BadMerkleProof if any partial tree is malformed or does not match
+    the hashMerkleRoot of its header.
+
+    Interior nodes are shared across the batch, so proofs for the same
+    block only hash the parts of its tree that they do not have in common.
+    '''
+    nodes = {}
+    results = []
+    for merkle_block in merkle_blocks:
+        (root, matches) = merkle_block.txn.extract_matches(nodes)
+        if root != merkle_block.header.hashMerkleRoot:
+            raise BadMerkleProof('root %064x does not match hashMerkleRoot %064x'
+                                 % (root, merkle_block.header.hashMerkleRoot))
+        results.append([txid for (_, txid) in matches])
+    return results
+
+
+def _naive_merkle_root(txids):
+    # The txid Merkle root computed level by level, as by ComputeMerkleRoot.
+    level = [ser_uint256(txid) for txid in txids]
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hash256(level[i] + level[i + 1]) for i in range(0, len(level), 2)]
+    return uint256_from_str(level[0])
+
+class TestFrameworkMerkleBlock(unittest.TestCase):
+    def block(self, n_transactions):
+        block = CBlock()
+        block.nTime = n_transactions
+        for i in range(n_transactions):
+            tx = CTransaction()
+            tx.nLockTime = i
+            tx.calc_sha256()
+            block.vtx.append(tx)
+        block.hashMerkleRoot = block.calc_merkle_root()
+        return block
+
+    def match_patterns(self, rnd, n):
+        yield []
+        yield [0]
+        yield [n - 1]
+        yield list(range(n))
+        yield list(range(0, n, 2))
+        yield list(range(1, n, 3))
+        for _ in range(3):
+            yield sorted(rnd.sample(range(n), rnd.randint(1, n)))
+
+    def test_round_trip(self):
+        rnd = random.Random(0)
+        for n in list(range(1, 18)) + [31, 32, 33, 100]:
+            block = self.block(n)
+            txids = [tx.sha256 for tx in block.vtx]
+            self.assertEqual(block.hashMerkleRoot, _naive_merkle_root(txids))
+            for matches in self.match_patterns(rnd, n):
+                # The order of the requested txids does not matter.
+                requested = [txids[i] for i in matches]
+                rnd.shuffle(requested)
+                proof = merkle_block_to_hex(build_merkle_block(block, requested))
+                merkle_block = merkle_block_from_hex(proof)
+                self.assertEqual(merkle_block.txn.nTransactions, n)
+                self.assertEqual(merkle_block.header.hashMerkleRoot, block.hashMerkleRoot)
+                (root, extracted) = merkle_block.txn.extract_matches()
+                self.assertEqual(root, block.hashMerkleRoot)
+                self.assertEqual(extracted, [(i, txids[i]) for i in matches])
+                self.assertEqual(verify_merkle_blocks([merkle_block]), [[txids[i] for i in matches]])
+
+    def test_bad_proofs(self):
+        block = self.block(9)
+        txids = [tx.sha256 for tx in block.vtx]
+        self.assertRaises(ValueError, build_merkle_block, block, [1])
+
+        merkle_block = build_merkle_block(block, txids[2:4])
+        merkle_block.txn.vHash[0] ^= 1
+        self.assertRaises(BadMerkleProof, verify_merkle_blocks, [merkle_block])
+
+        merkle_block = build_merkle_block(block, txids[2:4])
+        merkle_block.txn.vHash.append(0)
+        self.assertRaises(BadMerkleProof, verify_merkle_blocks, [merkle_block])
+
+        merkle_block = build_merkle_block(block, txids[2:4])
+        merkle_block.txn.vBits = merkle_block.txn.vBits[:3]
+        self.assertRaises(BadMerkleProof, verify_merkle_blocks, [merkle_block])
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# Copyright (c) 2026 The Zcash developers
+# Distributed under the MIT software license, see the accompanying
+# file COPYING or https://www.opensource.org/licenses/mit-license.php .
+
+#
+# merkletree.py
+#
+# Incremental Merkle trees over the transactions of a block, which keep every
+# level of the tree so that appending, replacing or removing a leaf only
+# rehashes the path from that leaf to the root.
+#
+# TxidMerkleTree: the hashMerkleRoot tree (double SHA-256; a node without a
+#                 right sibling is paired with itself)
+# AuthDataMerkleTree: the ZIP 244 hashAuthDataRoot tree (BLAKE2b; the leaves
+#                     are padded with zeros to a power of two)
+#
+
+import hashlib
+
+from .hashing import digest_many
+
+class IncrementalMerkleTree():
+    '''
+    A binary Merkle tree over a list of 32-byte leaves. levels[0] is the list
+    of leaves, and levels[i+1][j] is the hash of levels[i][2j] and its right
+    sibling, or of levels[i][2j] and the padding for level i if there is none.
+    The last level has a single node, the root.
+    '''
+
+    def __init__(self, leaves=()):
+        self.levels = [[]]
+        self.extend(leaves)
+
+    def combine(self, left, right):
+        raise NotImplementedError
+
+    def pad(self, level, left):
+        '''The right sibling of `left`, at `level`, when it has none.'''
+        raise NotImplementedError
+
+    def __len__(self):
+        return len(self.levels[0])
+
+    def root(self):
+        '''The root of the tree, or 32 zero bytes if it is empty.'''
+        if not self.levels[0]:
+            return b'\x00' * 32
+        return self.levels[-1][0]
+
+    def append(self, leaf):
+        self.levels[0].append(leaf)
+        self._rehash([len(self) - 1])
+
+    def extend(self, leaves):
+        start = len(self)
+        self.levels[0].extend(leaves)
+        self._rehash(range(start, len(self)))
+
+    def replace(self, index, leaf):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('leaf index out of range')
+        self.levels[0][index] = leaf
+        self._rehash([index])
+
+    def truncate(self, size):
+        '''Remove all but the first `size` leaves.'''
+        if size >= len(self):
+            return
+        del self.levels[0][size:]
+        # The new last leaf may have lost its right sibling.
+        self._rehash([size - 1] if size > 0 else [])
+
+    def assign(self, leaves):
+        '''
+        Make the leaves of the tree equal to `leaves`, rehashing only the
+        paths from the leaves that differ from the current ones.
+        '''
+        leaves = list(leaves)
+        current = self.levels[0]
+        common = min(len(current), len(leaves))
+        dirty = [i for i in range(common) if current[i] != leaves[i]]
+        if len(leaves) < len(current):
+            del current[len(leaves):]
+            if common > 0 and (not dirty or dirty[-1] != common - 1):
+                dirty.append(common - 1)
+        for i in dirty:
+            current[i] = leaves[i]
+        dirty.extend(range(len(current), len(leaves)))
+        current.extend(leaves[len(current):])
+        self._rehash(dirty)
+
+    def _rehash(self, dirty):
+        # `dirty` holds the ascending indices of the leaves that changed;
+        # recompute their ancestors one level at a time, so that shared
+        # ancestors are only hashed once.
+        level = 0
+        while len(self.levels[level]) > 1:
+            children = self.levels[level]
+            if len(self.levels) == level + 1:
+                self.levels.append([])
+            parents = self.levels[level + 1]
+            size = (len(children) + 1) // 2
+            del parents[size:]
+            parents.extend([None] * (size - len(parents)))
+
+            dirty_parents = []
+            for i in dirty:
+                j = i >> 1
+                if dirty_parents and dirty_parents[-1] == j:
+                    continue
+                left = children[2*j]
+                if 2*j + 1 < len(children):
+                    right = children[2*j + 1]
+                else:
+                    right = self.pad(level, left)
+                parents[j] = self.combine(left, right)
+                dirty_parents.append(j)
+            dirty = dirty_parents
+            level += 1
+        del self.levels[level + 1:]
+
+class TxidMerkleTree(IncrementalMerkleTree):
+    '''The tree committed to by hashMerkleRoot, over serialized txids.'''
+
+    def combine(self, left, right):
+        return hashlib.sha256(hashlib.sha256(left + right).digest()).digest()
+
+    def pad(self, level, left):
+        return left
+
+class AuthDataMerkleTree(IncrementalMerkleTree):
+    '''The tree committed to by hashAuthDataRoot, over auth digests.'''
+
+    # The roots of all-zero subtrees, by height.
+    _empty_roots = [b'\x00' * 32]
+
+    def combine(self, left, right):
+        return digest_many(b'ZcashAuthDatHash', (left, right))
+
+    def pad(self, level, left):
+        empty_roots = AuthDataMerkleTree._empty_roots
+        while len(empty_roots) <= level:
+            empty_roots.append(self.combine(empty_roots[-1], empty_roots[-1]))
+        return empty_roots[level]
@@ -26,6 +26,8 @@
 import struct
 import socket
 import asyncore
+import itertools
+import multiprocessing
 import time
 import sys
 import random
@@ -37,7 +39,11 @@ from threading import RLock
 from threading import Thread
 import logging
 import copy
-from hashlib import blake2b
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 from .equihash import (
     gbp_basic,
@@ -45,7 +51,10 @@ from .equihash import (
     hash_nonce,
     zcash_person,
 )
-from .util import bytes_to_hex_str
+from .hashing import blake2b_personalized
+from .merkletree import AuthDataMerkleTree, TxidMerkleTree
+from .solutioncache import DEFAULT_MAX_ENTRIES, SolutionCache
+from .util import NU5_BRANCH_ID, bytes_to_hex_str
 
 
 BIP0031_VERSION = 60000
@@ -83,6 +92,22 @@ mininode_socket_map = dict()
 # access to any data shared with the NodeConnCB or NodeConn.
 mininode_lock = RLock()
 
+# If set, a SolutionCache that CBlock.solve consults before searching for an
+# Equihash solution, and records its solutions in.
+SOLUTION_CACHE = None
+
+def enable_solution_cache(path, max_entries=DEFAULT_MAX_ENTRIES):
+    """Cache block solutions on disk at the given path."""
+    global SOLUTION_CACHE
+    SOLUTION_CACHE = SolutionCache(path, max_entries)
+
+def disable_solution_cache():
+    """Stop caching block solutions, and close the cache."""
+    global SOLUTION_CACHE
+    if SOLUTION_CACHE is not None:
+        SOLUTION_CACHE.close()
+        SOLUTION_CACHE = None
+
 # Serialization/deserialization tools
 def sha256(s):
     return hashlib.new('sha256', s).digest()
@@ -968,6 +993,67 @@ class CTxOut(object):
                hexlify(self.scriptPubKey))
 
 
+# zip244 imports this module (through script.py), so this module imports it
+# on first use.
+_zip244 = None
+
+def tx_digests(tx):
+    '''Compute the (txid, auth digest) of a transaction.'''
+    global _zip244
+    if tx.nVersion >= 5:
+        if _zip244 is None:
+            from . import zip244 as _zip244
+        return (_zip244.txid_digest(tx), _zip244.auth_digest(tx))
+    else:
+        return (hash256(tx.serialize()), b'\xFF'*32)
+
+def _raw_tx_digests(raw_txs):
+    digests = []
+    for raw in raw_txs:
+        tx = CTransaction()
+        tx.deserialize(BytesIO(raw))
+        digests.append(tx_digests(tx))
+    return digests
+
+# Smallest number of v5 transactions for which calc_tx_digests fans out to
+# worker processes.
+PARALLEL_TX_DIGESTS_THRESHOLD = 256
+
+def calc_tx_digests(txs, workers=None, cached=False):
+    '''
+    Compute the txids and auth digests of a list of transactions, as
+    calc_sha256 would for each, and store them on the transactions.
+
+    If `cached` is true, transactions whose digests have already been
+    computed keep them; as with sha256, call rehash() on such a transaction
+    after modifying it. If `workers` is greater than 1 and there are enough
+    v5 transactions to compute, their ZIP 244 digests are computed by that
+    many worker processes.
+    '''
+    if cached:
+        txs = [tx for tx in txs if tx.sha256 is None or tx.auth_digest is None]
+    v5 = [tx for tx in txs if tx.nVersion >= 5]
+    if workers is not None and workers > 1 and len(v5) >= PARALLEL_TX_DIGESTS_THRESHOLD:
+        chunk_size = -(-len(v5) // (4*workers))
+        chunks = [
+            [tx.serialize() for tx in v5[i:i+chunk_size]]
+            for i in range(0, len(v5), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_raw_tx_digests, chunks)
+            for (tx, digests) in zip(v5, itertools.chain.from_iterable(results)):
+                tx.set_digests(*digests)
+        txs = [tx for tx in txs if tx.nVersion < 5]
+    for tx in txs:
+        tx.calc_sha256()
+
+def _copy_if_nonempty(bundle, cls):
+    # Most transactions built by tests carry empty shielded bundles; avoid
+    # paying for copy.deepcopy on those.
+    if type(bundle) is cls and bundle.__dict__ == cls().__dict__:
+        return cls()
+    return copy.deepcopy(bundle)
+
+
 class CTransaction(object):
     def __init__(self, tx=None):
         if tx is None:
@@ -989,25 +1075,56 @@ class CTransaction(object):
             self.bindingSig = None
             self.sha256 = None
             self.hash = None
+            self.auth_digest = None
         else:
             self.fOverwintered = tx.fOverwintered
             self.nVersion = tx.nVersion
             self.nVersionGroupId = tx.nVersionGroupId
-            self.vin = copy.deepcopy(tx.vin)
-            self.vout = copy.deepcopy(tx.vout)
+            # The transparent parts are what tests malleate, so they get
+            # fresh CTxIn/CTxOut/COutPoint objects; scripts are immutable
+            # bytes and are shared with the original.
+            self.vin = [
+                CTxIn(COutPoint(x.prevout.hash, x.prevout.n), x.scriptSig, x.nSequence)
+                for x in tx.vin]
+            self.vout = [CTxOut(x.nValue, x.scriptPubKey) for x in tx.vout]
             self.nLockTime = tx.nLockTime
             self.nExpiryHeight = tx.nExpiryHeight
             self.valueBalance = tx.valueBalance
-            self.saplingBundle = copy.deepcopy(tx.saplingBundle)
-            self.orchardBundle = copy.deepcopy(tx.orchardBundle)
-            self.shieldedSpends = copy.deepcopy(tx.shieldedSpends)
-            self.shieldedOutputs = copy.deepcopy(tx.shieldedOutputs)
-            self.vJoinSplit = copy.deepcopy(tx.vJoinSplit)
+            self.saplingBundle = _copy_if_nonempty(tx.saplingBundle, SaplingBundle)
+            self.orchardBundle = _copy_if_nonempty(tx.orchardBundle, OrchardBundle)
+            self.shieldedSpends = copy.deepcopy(tx.shieldedSpends) if tx.shieldedSpends else []
+            self.shieldedOutputs = copy.deepcopy(tx.shieldedOutputs) if tx.shieldedOutputs else []
+            self.vJoinSplit = copy.deepcopy(tx.vJoinSplit) if tx.vJoinSplit else []
+            if hasattr(tx, 'nConsensusBranchId'):
+                self.nConsensusBranchId = tx.nConsensusBranchId
             self.joinSplitPubKey = tx.joinSplitPubKey
             self.joinSplitSig = tx.joinSplitSig
             self.bindingSig = tx.bindingSig
             self.sha256 = None
             self.hash = None
+            self.auth_digest = None
+
+    def replace(self, **fields):
+        """
+        Return a copy of this transaction with the given fields replaced.
+
+        Unlike CTransaction(tx), which gives the clone its own inputs and
+        outputs, the returned transaction shares every field that is not
+        named in `fields` with this one. Callers must therefore treat the
+        shared sub-objects as read-only, and pass new lists (or objects) for
+        anything they intend to mutate, e.g.
+
+            tx2 = tx.replace(vout=tx.vout[:1], nLockTime=500)
+        """
+        clone = copy.copy(self)
+        for (name, value) in fields.items():
+            if not hasattr(self, name):
+                raise AttributeError("CTransaction has no field %r" % name)
+            setattr(clone, name, value)
+        clone.sha256 = None
+        clone.hash = None
+        clone.auth_digest = None
+        return clone
 
     def deserialize(self, f):
         header = struct.unpack("<I", f.read(4))[0]
@@ -1069,8 +1186,15 @@ class CTransaction(object):
 
         self.sha256 = None
         self.hash = None
-
-    def serialize(self):
+        self.auth_digest = None
+
+    def serialize_parts(self):
+        '''
+        Return the serialization of the transaction, minus vin and vout, as
+        the pair of the bytes before vin and the bytes after vout. This lets
+        callers serialize modified inputs and outputs in between without
+        copying the transaction.
+        '''
         header = (int(self.fOverwintered)<<31) | self.nVersion
         isOverwinterV3 = (self.fOverwintered and
                           self.nVersionGroupId == OVERWINTER_VERSION_GROUP_ID and
@@ -1083,64 +1207,64 @@ class CTransaction(object):
                        self.nVersion == 5)
 
         if isNu5V5:
-            r = b""
+            head = b""
 
             # Common transaction fields
-            r += struct.pack("<I", header)
-            r += struct.pack("<I", self.nVersionGroupId)
-            r += struct.pack("<I", self.nConsensusBranchId)
-            r += struct.pack("<I", self.nLockTime)
-            r += struct.pack("<I", self.nExpiryHeight)
+            head += struct.pack("<I", header)
+            head += struct.pack("<I", self.nVersionGroupId)
+            head += struct.pack("<I", self.nConsensusBranchId)
+            head += struct.pack("<I", self.nLockTime)
+            head += struct.pack("<I", self.nExpiryHeight)
 
-            # Transparent transaction fields
-            r += ser_vector(self.vin)
-            r += ser_vector(self.vout)
+            # Transparent transaction fields go here.
+
+            tail = b""
 
             # Sapling transaction fields
-            r += self.saplingBundle.serialize()
+            tail += self.saplingBundle.serialize()
 
             # Orchard transaction fields
-            r += self.orchardBundle.serialize()
+            tail += self.orchardBundle.serialize()
 
-            return r
+            return (head, tail)
 
-        r = b""
-        r += struct.pack("<I", header)
+        head = b""
+        head += struct.pack("<I", header)
         if self.fOverwintered:
-            r += struct.pack("<I", self.nVersionGroupId)
-        r += ser_vector(self.vin)
-        r += ser_vector(self.vout)
-        r += struct.pack("<I", self.nLockTime)
+            head += struct.pack("<I", self.nVersionGroupId)
+        tail = b""
+        tail += struct.pack("<I", self.nLockTime)
         if isOverwinterV3 or isSaplingV4:
-            r += struct.pack("<I", self.nExpiryHeight)
+            tail += struct.pack("<I", self.nExpiryHeight)
         if isSaplingV4:
-            r += struct.pack("<q", self.valueBalance)
-            r += ser_vector(self.shieldedSpends)
-            r += ser_vector(self.shieldedOutputs)
+            tail += struct.pack("<q", self.valueBalance)
+            tail += ser_vector(self.shieldedSpends)
+            tail += ser_vector(self.shieldedOutputs)
         if self.nVersion >= 2:
-            r += ser_vector(self.vJoinSplit)
+            tail += ser_vector(self.vJoinSplit)
             if len(self.vJoinSplit) > 0:
-                r += ser_uint256(self.joinSplitPubKey)
-                r += self.joinSplitSig
+                tail += ser_uint256(self.joinSplitPubKey)
+                tail += self.joinSplitSig
         if isSaplingV4 and not (len(self.shieldedSpends) == 0 and len(self.shieldedOutputs) == 0):
-            r += self.bindingSig.serialize()
-        return r
+            tail += self.bindingSig.serialize()
+        return (head, tail)
+
+    def serialize(self):
+        (head, tail) = self.serialize_parts()
+        return head + ser_vector(self.vin) + ser_vector(self.vout) + tail
 
     def rehash(self):
         self.sha256 = None
         self.calc_sha256()
 
     def calc_sha256(self):
-        if self.nVersion >= 5:
-            from . import zip244
-            txid = zip244.txid_digest(self)
-            self.auth_digest = zip244.auth_digest(self)
-        else:
-            txid = hash256(self.serialize())
-            self.auth_digest = b'\xFF'*32
+        self.set_digests(*tx_digests(self))
+
+    def set_digests(self, txid, auth_digest):
         if self.sha256 is None:
             self.sha256 = uint256_from_str(txid)
         self.hash = encode(txid[::-1], 'hex_codec').decode('ascii')
+        self.auth_digest = auth_digest
         self.auth_digest_hex = encode(self.auth_digest[::-1], 'hex_codec').decode('ascii')
 
     def is_valid(self):
@@ -1250,6 +1374,11 @@ class CBlock(CBlockHeader):
     def __init__(self, header=None):
         super(CBlock, self).__init__(header)
         self.vtx = []
+        # Merkle trees over vtx, kept between calls to calc_merkle_root and
+        # calc_auth_data_root so that only the paths from transactions that
+        # changed since the last call are rehashed.
+        self.merkle_tree = None
+        self.auth_data_tree = None
 
     def deserialize(self, f):
         super(CBlock, self).deserialize(f)
@@ -1261,46 +1390,26 @@ class CBlock(CBlockHeader):
         r += ser_vector(self.vtx)
         return r
 
-    def calc_merkle_root(self):
-        hashes = []
-        for tx in self.vtx:
-            tx.calc_sha256()
-            hashes.append(ser_uint256(tx.sha256))
-        while len(hashes) > 1:
-            newhashes = []
-            for i in range(0, len(hashes), 2):
-                i2 = min(i+1, len(hashes)-1)
-                newhashes.append(hash256(hashes[i] + hashes[i2]))
-            hashes = newhashes
-        return uint256_from_str(hashes[0])
-
-    def calc_auth_data_root(self):
-        hashes = []
-        nleaves = 0
-        for tx in self.vtx:
-            tx.calc_sha256()
-            hashes.append(tx.auth_digest)
-            nleaves += 1
-        # Continue adding leaves (of zeros) until reaching a power of 2
-        while nleaves & (nleaves-1) > 0:
-            hashes.append(b'\x00'*32)
-            nleaves += 1
-        while len(hashes) > 1:
-            newhashes = []
-            for i in range(0, len(hashes), 2):
-                digest = blake2b(digest_size=32, person=b'ZcashAuthDatHash')
-                digest.update(hashes[i])
-                digest.update(hashes[i+1])
-                newhashes.append(digest.digest())
-            hashes = newhashes
-        return uint256_from_str(hashes[0])
+    def calc_merkle_root(self, workers=None):
+        calc_tx_digests(self.vtx, workers)
+        if self.merkle_tree is None:
+            self.merkle_tree = TxidMerkleTree()
+        self.merkle_tree.assign([ser_uint256(tx.sha256) for tx in self.vtx])
+        return uint256_from_str(self.merkle_tree.root())
+
+    def calc_auth_data_root(self, workers=None):
+        calc_tx_digests(self.vtx, workers)
+        if self.auth_data_tree is None:
+            self.auth_data_tree = AuthDataMerkleTree()
+        self.auth_data_tree.assign([tx.auth_digest for tx in self.vtx])
+        return uint256_from_str(self.auth_data_tree.root())
 
     def is_valid(self, n=48, k=5):
         # H(I||...
-        digest = blake2b(digest_size=(512//n)*n//8, person=zcash_person(n, k))
+        digest = blake2b_personalized(zcash_person(n, k), (512//n)*n//8)
         digest.update(super(CBlock, self).serialize()[:108])
         hash_nonce(digest, self.nNonce)
-        if not gbp_validate(self.nSolution, digest, n, k):
+        if not gbp_validate(digest, self.nSolution, n, k):
             return False
         self.calc_sha256()
         target = uint256_from_compact(self.nBits)
@@ -1313,25 +1422,38 @@ class CBlock(CBlockHeader):
             return False
         return True
 
-    def solve(self, n=48, k=5):
-        target = uint256_from_compact(self.nBits)
+    def solve(self, n=48, k=5, parallel=None, deterministic=True):
+        '''
+        Find a nonce and Equihash solution for which the block hash meets the
+        nBits target.
+
+        If `parallel` is greater than 1, that many worker processes search
+        disjoint ranges of nonces. In deterministic mode the result is the
+        same nonce and solution that a sequential search finds; otherwise the
+        first solution found by any worker is used.
+        '''
         # H(I||...
-        digest = blake2b(digest_size=(512//n)*n//8, person=zcash_person(n, k))
-        digest.update(super(CBlock, self).serialize()[:108])
-        self.nNonce = 0
-        while True:
-            # H(I||V||...
-            curr_digest = digest.copy()
-            hash_nonce(curr_digest, self.nNonce)
-            # (x_1, x_2, ...) = A(I, V, n, k)
-            solns = gbp_basic(curr_digest, n, k)
-            for soln in solns:
-                assert(gbp_validate(curr_digest, soln, n, k))
-                self.nSolution = soln
-                self.rehash()
-                if self.sha256 <= target:
-                    return
-            self.nNonce += 1
+        header = super(CBlock, self).serialize()[:108]
+        cached = None
+        if SOLUTION_CACHE is not None:
+            cached = SOLUTION_CACHE.get(header, n, k)
+            # A stale or corrupt entry is a miss, and is replaced below.
+            if cached is not None and not check_header_solution(header, self.nBits, n, k, *cached):
+                cached = None
+        if cached is not None:
+            (self.nNonce, self.nSolution) = cached
+        elif parallel is not None and parallel > 1:
+            (self.nNonce, self.nSolution) = solve_header_parallel(
+                header, self.nBits, n, k, parallel, deterministic)
+        else:
+            (self.nNonce, self.nSolution) = solve_header(
+                header, self.nBits, n, k, itertools.count())
+        # Only store the solution a sequential search finds, so that the
+        # cache returns the same solution whatever mode it was solved in.
+        if SOLUTION_CACHE is not None and cached is None and \
+                (deterministic or parallel is None or parallel <= 1):
+            SOLUTION_CACHE.put(header, n, k, self.nNonce, self.nSolution)
+        self.rehash()
 
     def __repr__(self):
         return "CBlock(nVersion=%i hashPrevBlock=%064x hashMerkleRoot=%064x hashFinalSaplingRoot=%064x nTime=%s nBits=%08x nNonce=%064x nSolution=%r vtx=%r)" \
@@ -1340,6 +1462,106 @@ class CBlock(CBlockHeader):
                self.nNonce, self.nSolution, self.vtx)
 
 
+def solve_header(header, nBits, n, k, nonces):
+    '''
+    Try the given nonces in order for the 108-byte block header prefix
+    `header`, and return the first (nNonce, nSolution) pair for which the
+    block hash meets the nBits target, or None if there is none.
+    '''
+    target = uint256_from_compact(nBits)
+    digest = blake2b_personalized(zcash_person(n, k), (512//n)*n//8)
+    digest.update(header)
+    for nonce in nonces:
+        # H(I||V||...
+        curr_digest = digest.copy()
+        hash_nonce(curr_digest, nonce)
+        # (x_1, x_2, ...) = A(I, V, n, k)
+        solns = gbp_basic(curr_digest, n, k)
+        for soln in solns:
+            assert(gbp_validate(curr_digest, soln, n, k))
+            r = header + ser_uint256(nonce) + ser_char_vector(soln)
+            if uint256_from_str(hash256(r)) <= target:
+                return (nonce, soln)
+    return None
+
+def check_header_solution(header, nBits, n, k, nonce, soln):
+    '''
+    Whether nonce and soln are a valid Equihash solution for the 108-byte
+    block header prefix `header` for which the block hash meets the nBits
+    target.
+    '''
+    digest = blake2b_personalized(zcash_person(n, k), (512//n)*n//8)
+    digest.update(header)
+    hash_nonce(digest, nonce)
+    if not gbp_validate(digest, soln, n, k):
+        return False
+    r = header + ser_uint256(nonce) + ser_char_vector(soln)
+    return uint256_from_str(hash256(r)) <= uint256_from_compact(nBits)
+
+# Number of nonces handed to a worker process at a time by
+# solve_header_parallel.
+SOLVE_CHUNK_SIZE = 4
+
+# In solve_header_parallel workers, the lowest chunk known to contain a
+# solution. Workers stop searching chunks above it.
+_solve_found = None
+
+def _init_solve_worker(found):
+    global _solve_found
+    _solve_found = found
+
+def _solve_chunk(header, nBits, n, k, chunk):
+    def nonces():
+        for nonce in range(chunk*SOLVE_CHUNK_SIZE, (chunk+1)*SOLVE_CHUNK_SIZE):
+            if _solve_found.value < chunk:
+                return
+            yield nonce
+    result = solve_header(header, nBits, n, k, nonces())
+    if result is not None:
+        with _solve_found.get_lock():
+            _solve_found.value = min(_solve_found.value, chunk)
+    return result
+
+def solve_header_parallel(header, nBits, n, k, workers, deterministic=True):
+    '''
+    Like solve_header over all nonces, but searching chunks of
+    SOLVE_CHUNK_SIZE nonces across a pool of `workers` processes.
+
+    In deterministic mode, the result from a chunk is only used once every
+    lower chunk is known to have no solution, so the result is the one that
+    the sequential search would have found. Workers abandon any chunk above
+    the lowest one found to contain a solution.
+    '''
+    found = multiprocessing.Value('q', 2**62)
+    pending = {}
+    results = {}
+    next_chunk = 0
+    lowest = 0
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_solve_worker,
+            initargs=(found,)) as executor:
+        try:
+            while True:
+                while len(pending) < 2*workers:
+                    pending[next_chunk] = executor.submit(
+                        _solve_chunk, header, nBits, n, k, next_chunk)
+                    next_chunk += 1
+                wait(pending.values(), return_when=FIRST_COMPLETED)
+                for chunk in [c for (c, f) in pending.items() if f.done()]:
+                    results[chunk] = pending.pop(chunk).result()
+                    if not deterministic and results[chunk] is not None:
+                        found.value = -1
+                        return results[chunk]
+                while lowest in results:
+                    if results[lowest] is not None:
+                        return results[lowest]
+                    lowest += 1
+        finally:
+            for f in pending.values():
+                f.cancel()
+
+
 class CUnsignedAlert(object):
     def __init__(self):
         self.nVersion = 1
@@ -2114,3 +2336,95 @@ class EarlyDisconnectError(Exception):
 
     def __str__(self):
         return repr(self.value)
+
+
+class TestFrameworkMininode(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='mininode')
+
+    def tearDown(self):
+        disable_solution_cache()
+        shutil.rmtree(self.tmpdir)
+
+    def block(self, nTime):
+        block = CBlock()
+        block.nBits = 0x200f0f0f
+        block.nTime = nTime
+        return block
+
+    def test_solution_cache(self):
+        enable_solution_cache(os.path.join(self.tmpdir, 'solutions.sqlite'))
+        block = self.block(1)
+        header = block.serialize()[:108]
+        block.solve()
+        self.assertTrue(block.is_valid())
+        self.assertEqual(SOLUTION_CACHE.get(header, 48, 5), (block.nNonce, block.nSolution))
+
+        # A corrupt entry is a miss, and is replaced.
+        SOLUTION_CACHE.put(header, 48, 5, block.nNonce, bytes(len(block.nSolution)))
+        again = self.block(1)
+        again.solve()
+        self.assertEqual((again.nNonce, again.nSolution), (block.nNonce, block.nSolution))
+        self.assertEqual(SOLUTION_CACHE.get(header, 48, 5), (block.nNonce, block.nSolution))
+
+        # The solution of a non-deterministic parallel search is not stored.
+        other = self.block(2)
+        other.solve(parallel=2, deterministic=False)
+        self.assertTrue(other.is_valid())
+        self.assertIsNone(SOLUTION_CACHE.get(other.serialize()[:108], 48, 5))
+
+    def test_solve_parallel_deterministic(self):
+        # The first solutions of these headers are at nonces 107, 11 and
+        # 140, past the first chunk, so the parallel search must wait for
+        # every lower chunk to come back empty.
+        for (nTime, nBits) in [(1, 0x200f0f0f), (2, 0x2007ffff), (3, 0x2003ffff)]:
+            block = self.block(nTime)
+            block.nBits = nBits
+            header = block.serialize()[:108]
+            expected = solve_header(header, nBits, 48, 5, itertools.count())
+            for workers in (2, 3):
+                self.assertEqual(solve_header_parallel(header, nBits, 48, 5, workers), expected)
+            block.solve(parallel=2)
+            self.assertEqual((block.nNonce, block.nSolution), expected)
+            self.assertTrue(block.is_valid())
+
+    def v5_transactions(self, count):
+        rnd = random.Random(count)
+        txs = []
+        for _ in range(count):
+            tx = CTransaction()
+            tx.nVersion = 5
+            tx.nVersionGroupId = ZIP225_VERSION_GROUP_ID
+            tx.nConsensusBranchId = NU5_BRANCH_ID
+            tx.vin.append(CTxIn(COutPoint(rnd.getrandbits(256), 0), rnd.randbytes(72)))
+            tx.vout.append(CTxOut(rnd.randrange(10**8), rnd.randbytes(25)))
+            txs.append(tx)
+        return txs
+
+    def test_tx_digests(self):
+        block = self.block(1)
+        block.vtx = self.v5_transactions(5)
+        (merkle_root, auth_data_root) = (block.calc_merkle_root(), block.calc_auth_data_root())
+
+        # Changing a scriptSig changes the auth data root, without a rehash().
+        tx = block.vtx[2]
+        tx.vin[0].scriptSig = b'\x00' + tx.vin[0].scriptSig[1:]
+        self.assertNotEqual(block.calc_auth_data_root(), auth_data_root)
+        self.assertEqual(block.calc_merkle_root(), merkle_root)
+        expected = self.block(1)
+        expected.vtx = [CTransaction(tx) for tx in block.vtx]
+        self.assertEqual(block.calc_auth_data_root(), expected.calc_auth_data_root())
+
+        # Cached digests are only kept when asked for.
+        tx.vin[0].scriptSig = b'\x01' + tx.vin[0].scriptSig[1:]
+        calc_tx_digests([tx], cached=True)
+        self.assertEqual(tx.auth_digest, expected.vtx[2].auth_digest)
+        calc_tx_digests([tx])
+        self.assertNotEqual(tx.auth_digest, expected.vtx[2].auth_digest)
+
+    def test_tx_digests_parallel(self):
+        txs = self.v5_transactions(PARALLEL_TX_DIGESTS_THRESHOLD)
+        calc_tx_digests(txs, workers=2)
+        for tx in txs:
+            (txid, auth_digest) = tx_digests(tx)
+            self.assertEqual((tx.sha256, tx.auth_digest), (uint256_from_str(txid), auth_digest))
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# Copyright (c) 2026 The Zcash developers
+# Distributed under the MIT software license, see the accompanying
+# file COPYING or https://www.opensource.org/licenses/mit-license.php .
+
+#
+# rpctrace.py
+#
+# RPCTracer: statistics on the RPC calls made by a test, per node and method:
+#     call counts, errors by code, request and response sizes, and a latency
+#     histogram. Proxies made by util.get_rpc_proxy report every call to
+#     TRACER; the statistics are kept in memory, and handed to the tracer's
+#     consumers (such as the RPC coverage log) when it is flushed, once at
+#     exit.
+#
+
+import json
+import threading
+import unittest
+
+# The method under which a batch request as a whole is recorded. Each call
+# in it is also recorded under its own method.
+BATCH = '(batch)'
+
+# The upper bounds, in seconds, of the buckets of the latency histograms:
+# powers of two from 2^-13 s (about 122 us) to 64 s. A last bucket holds
+# the calls that took longer.
+LATENCY_BUCKETS = [2.0 ** e for e in range(-13, 7)]
+
+class MethodStats():
+    '''The calls to one method of one node.'''
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = {}
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, elapsed, request_bytes, response_bytes, error):
+        self.calls += 1
+        if error is not None:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and elapsed > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    @property
+    def n_errors(self):
+        return sum(self.errors.values())
+
+    @property
+    def n_succeeded(self):
+        return self.calls - self.n_errors
+
+    def percentile(self, q):
+        '''An upper bound on the q-th percentile latency, in seconds.'''
+        rank = q / 100 * self.calls
+        seen = 0
+        for (bucket, count) in enumerate(self.histogram):
+            seen += count
+            if count and seen >= rank:
+                if bucket < len(LATENCY_BUCKETS):
+                    return min(LATENCY_BUCKETS[bucket], self.max_time)
+                return self.max_time
+        return 0.0
+
+    def to_json(self):
+        return {
+            'calls': self.calls,
+            'errors': {str(code): n for (code, n) in self.errors.items()},
+            'total_time': self.total_time,
+            'max_time': self.max_time,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'latency_histogram': self.histogram,
+        }
+
+class RPCTracer():
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # (node, method) -> MethodStats
+        self.stats = {}
+        self._consumers = []
+
+    def record(self, node, method, elapsed, request_bytes=0, response_bytes=0, error=None):
+        '''
+        Record a call. `error` is the JSON-RPC error code, or the name of
+        the exception that interrupted the call, or None if it succeeded.
+        '''
+        with self._lock:
+            key = (node, method)
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = MethodStats()
+            stats.add(elapsed, request_bytes, response_bytes, error)
+
+    def for_node(self, node):
+        '''The callback with which a proxy for `node` reports its calls.'''
+        def trace(method, elapsed, request_bytes=0, response_bytes=0, error=None):
+            self.record(node, method, elapsed, request_bytes, response_bytes, error)
+        return trace
+
+    def methods(self, node):
+        '''The methods that were called on node.'''
+        with self._lock:
+            return sorted(method for (n, method) in self.stats if n == node)
+
+    def covered_methods(self, node):
+        '''
+        The RPC methods that node answered successfully at least once, not
+        counting batches as such.
+        '''
+        with self._lock:
+            return sorted(
+                method for ((n, method), stats) in self.stats.items()
+                if n == node and method != BATCH and stats.n_succeeded > 0)
+
+    def nodes(self):
+        with self._lock:
+            return sorted(set(node for (node, _) in self.stats), key=str)
+
+    def add_consumer(self, consumer):
+        '''Call consumer(tracer) when the tracer is flushed.'''
+        if consumer not in self._consumers:
+            self._consumers.append(consumer)
+
+    def flush(self):
+        with self._flush_lock:
+            for consumer in self._consumers:
+                consumer(self)
+
+    def to_json(self):
+        with self._lock:
+            nodes = {}
+            for ((node, method), stats) in sorted(self.stats.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+                nodes.setdefault(str(node), {})[method] = stats.to_json()
+        return {
+            'latency_buckets': LATENCY_BUCKETS,
+            'nodes': nodes,
+        }
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf8') as f:
+            json.dump(self.to_json(), f, indent=1, sort_keys=True)
+
+    def summary_table(self):
+        '''The statistics of each node and method, by total time spent.'''
+        with self._lock:
+            rows = sorted(self.stats.items(), key=lambda item: -item[1].total_time)
+        header = ('node', 'method', 'calls', 'errors', 'total s', 'mean ms',
+                  'p50 ms', 'p99 ms', 'max ms', 'sent KB', 'recv KB')
+        lines = [header]
+        for ((node, method), s) in rows:
+            lines.append((
+                str(node), method, str(s.calls), str(s.n_errors),
+                '%.3f' % s.total_time,
+                '%.2f' % (1000 * s.total_time / s.calls),
+                '%.2f' % (1000 * s.percentile(50)),
+                '%.2f' % (1000 * s.percentile(99)),
+                '%.2f' % (1000 * s.max_time),
+                '%.1f' % (s.request_bytes / 1024),
+                '%.1f' % (s.response_bytes / 1024),
+            ))
+        widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+        return '\n'.join(
+            '  '.join(cell.ljust(w) if i < 2 else cell.rjust(w)
+                      for (i, (cell, w)) in enumerate(zip(line, widths)))
+            for line in lines)
+
+TRACER = RPCTracer()
+
+
+class TestFrameworkRPCTrace(unittest.TestCase):
+    def test_covered_methods(self):
+        tracer = RPCTracer()
+        trace = tracer.for_node(0)
+        trace('getinfo', 0.001)
+        trace('getblock', 0.001, error=-5)
+        trace('stop', 0.001, error='ConnectionRefusedError')
+        trace(BATCH, 0.002)
+        trace('getbestblockhash', 0.001, error='BrokenPipeError')
+        trace('getbestblockhash', 0.001)
+        tracer.record(1, 'help', 0.001)
+
+        self.assertEqual(tracer.methods(0), sorted(
+            ['getinfo', 'getblock', 'stop', BATCH, 'getbestblockhash']))
+        self.assertEqual(tracer.covered_methods(0), ['getbestblockhash', 'getinfo'])
+        self.assertEqual(tracer.covered_methods(1), ['help'])
+        self.assertEqual(tracer.stats[(0, 'getbestblockhash')].n_succeeded, 1)
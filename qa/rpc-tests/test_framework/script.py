@@ -23,13 +23,27 @@ if sys.version > '3':
     bchr = lambda x: bytes([x])
     bord = lambda x: x
 
-from hashlib import blake2b
-
+from array import array
 from binascii import hexlify
+from collections import Counter
+from io import BytesIO
+import json
+import os
 import struct
+import unittest
 
 from test_framework.bignum import bn2vch
-from test_framework.mininode import (CTransaction, CTxOut, hash256, ser_string, ser_uint256)
+from test_framework.hashing import blake2b_personalized, digest_many
+from test_framework.mininode import (
+    SAPLING_VERSION_GROUP_ID,
+    CTransaction,
+    CTxOut,
+    hash256,
+    ser_compact_size,
+    ser_string,
+    ser_uint256,
+    ser_vector,
+)
 
 MAX_SCRIPT_SIZE = 10000
 MAX_SCRIPT_ELEMENT_SIZE = 520
@@ -696,62 +710,97 @@ class CScript(bytes):
             # returns a bytes instance even when subclassed.
             return super(CScript, cls).__new__(cls, b''.join(coerce_iterable(value)))
 
-    def raw_iter(self):
-        """Raw iteration
+    def scan(self):
+        """Parse the script in one pass
 
-        Yields tuples of (opcode, data, sop_idx) so that the different possible
-        PUSHDATA encodings can be accurately distinguished, as well as
-        determining the exact opcode byte indexes. (sop_idx)
+        Returns a flat array of (opcode, offset, length) triples, one per
+        opcode. For pushes, offset and length locate the pushed data; for
+        other opcodes, offset is the index of the opcode and length is 0.
+
+        The array is computed once and cached on the instance. If the script
+        is invalid it covers the opcodes before the invalid one, and
+        raw_iter() raises the error after yielding them.
         """
+        try:
+            return self._ops
+        except AttributeError:
+            pass
+
+        ops = array('L')
+        error = None
         i = 0
-        while i < len(self):
-            sop_idx = i
-            opcode = bord(self[i])
+        end = len(self)
+        while i < end:
+            opcode = self[i]
             i += 1
 
             if opcode > OP_PUSHDATA4:
-                yield (opcode, None, sop_idx)
+                ops.extend((opcode, i - 1, 0))
+                continue
+
+            if opcode < OP_PUSHDATA1:
+                pushdata_type = 'PUSHDATA(%d)'
+                datasize = opcode
+            elif opcode == OP_PUSHDATA1:
+                pushdata_type = 'PUSHDATA1'
+                if i >= end:
+                    error = ('PUSHDATA1: missing data length', None)
+                    break
+                datasize = self[i]
+                i += 1
+            elif opcode == OP_PUSHDATA2:
+                pushdata_type = 'PUSHDATA2'
+                if i + 1 >= end:
+                    error = ('PUSHDATA2: missing data length', None)
+                    break
+                datasize = self[i] + (self[i+1] << 8)
+                i += 2
             else:
-                datasize = None
-                pushdata_type = None
+                pushdata_type = 'PUSHDATA4'
+                if i + 3 >= end:
+                    error = ('PUSHDATA4: missing data length', None)
+                    break
+                datasize = self[i] + (self[i+1] << 8) + (self[i+2] << 16) + (self[i+3] << 24)
+                i += 4
+
+            # Check for truncation
+            if i + datasize > end:
                 if opcode < OP_PUSHDATA1:
-                    pushdata_type = 'PUSHDATA(%d)' % opcode
-                    datasize = opcode
-
-                elif opcode == OP_PUSHDATA1:
-                    pushdata_type = 'PUSHDATA1'
-                    if i >= len(self):
-                        raise CScriptInvalidError('PUSHDATA1: missing data length')
-                    datasize = bord(self[i])
-                    i += 1
-
-                elif opcode == OP_PUSHDATA2:
-                    pushdata_type = 'PUSHDATA2'
-                    if i + 1 >= len(self):
-                        raise CScriptInvalidError('PUSHDATA2: missing data length')
-                    datasize = bord(self[i]) + (bord(self[i+1]) << 8)
-                    i += 2
-
-                elif opcode == OP_PUSHDATA4:
-                    pushdata_type = 'PUSHDATA4'
-                    if i + 3 >= len(self):
-                        raise CScriptInvalidError('PUSHDATA4: missing data length')
-                    datasize = bord(self[i]) + (bord(self[i+1]) << 8) + (bord(self[i+2]) << 16) + (bord(self[i+3]) << 24)
-                    i += 4
-
-                else:
-                    assert False # shouldn't happen
+                    pushdata_type = pushdata_type % opcode
+                error = ('%s: truncated data' % pushdata_type, bytes(self[i:end]))
+                break
 
+            ops.extend((opcode, i, datasize))
+            i += datasize
 
-                data = bytes(self[i:i+datasize])
+        self._ops = ops
+        self._scan_error = error
+        return ops
 
-                # Check for truncation
-                if len(data) < datasize:
-                    raise CScriptTruncatedPushDataError('%s: truncated data' % pushdata_type, data)
+    def _raise_scan_error(self):
+        if self._scan_error is not None:
+            (msg, data) = self._scan_error
+            if data is None:
+                raise CScriptInvalidError(msg)
+            raise CScriptTruncatedPushDataError(msg, data)
 
-                i += datasize
+    def raw_iter(self):
+        """Raw iteration
 
-                yield (opcode, data, sop_idx)
+        Yields tuples of (opcode, data, sop_idx) so that the different possible
+        PUSHDATA encodings can be accurately distinguished, as well as
+        determining the exact opcode byte indexes. (sop_idx)
+        """
+        ops = self.scan()
+        for j in range(0, len(ops), 3):
+            opcode = ops[j]
+            offset = ops[j+1]
+            if opcode > OP_PUSHDATA4:
+                yield (opcode, None, offset)
+            else:
+                data = bytes(self[offset:offset+ops[j+2]])
+                yield (opcode, data, offset - _PUSHDATA_HEADER_SIZE[opcode])
+        self._raise_scan_error()
 
     def __iter__(self):
         """'Cooked' iteration
@@ -809,52 +858,143 @@ class CScript(bytes):
 
         Note that this is consensus-critical.
         """
-        n = 0
-        lastOpcode = OP_INVALIDOPCODE
-        for (opcode, data, sop_idx) in self.raw_iter():
-            if opcode in (OP_CHECKSIG, OP_CHECKSIGVERIFY):
-                n += 1
-            elif opcode in (OP_CHECKMULTISIG, OP_CHECKMULTISIGVERIFY):
-                if fAccurate and (OP_1 <= lastOpcode <= OP_16):
-                    n += opcode.decode_op_n()
-                else:
-                    n += 20
-            lastOpcode = opcode
+        n = _count_sigops(self.scan()[0::3], fAccurate)
+        self._raise_scan_error()
         return n
 
 
+# Number of bytes before the pushed data, for each push opcode.
+_PUSHDATA_HEADER_SIZE = [1] * OP_PUSHDATA1 + [2, 3, 5]
+
+def _count_sigops(opcodes, fAccurate):
+    n = opcodes.count(OP_CHECKSIG) + opcodes.count(OP_CHECKSIGVERIFY)
+    n_multisig = opcodes.count(OP_CHECKMULTISIG) + opcodes.count(OP_CHECKMULTISIGVERIFY)
+    if n_multisig == 0:
+        return n
+    if not fAccurate:
+        return n + 20 * n_multisig
+    lastOpcode = OP_INVALIDOPCODE
+    for opcode in opcodes:
+        if opcode == OP_CHECKMULTISIG or opcode == OP_CHECKMULTISIGVERIFY:
+            if OP_1 <= lastOpcode <= OP_16:
+                n += lastOpcode - OP_1 + 1
+            else:
+                n += 20
+        lastOpcode = opcode
+    return n
+
+def _as_script(script):
+    return script if isinstance(script, CScript) else CScript(script)
+
+def GetLegacySigOpCount(tx):
+    """Count the sigops in the scriptSigs and scriptPubKeys of a transaction.
+
+    As in the node, each script is only counted up to its first invalid
+    opcode, rather than raising.
+    """
+    n = 0
+    for txin in tx.vin:
+        n += _count_sigops(_as_script(txin.scriptSig).scan()[0::3], False)
+    for txout in tx.vout:
+        n += _count_sigops(_as_script(txout.scriptPubKey).scan()[0::3], False)
+    return n
+
+def GetBlockLegacySigOpCount(block):
+    """The total legacy sigop count of the transactions in a block."""
+    return sum(GetLegacySigOpCount(tx) for tx in block.vtx)
+
+TX_NONSTANDARD = 'nonstandard'
+TX_PUBKEY = 'pubkey'
+TX_PUBKEYHASH = 'pubkeyhash'
+TX_SCRIPTHASH = 'scripthash'
+TX_MULTISIG = 'multisig'
+TX_NULL_DATA = 'nulldata'
+
+def _valid_pubkey_size(data):
+    """CPubKey::ValidSize(): whether the first byte of data fits its length."""
+    if len(data) == 33:
+        return data[0] in (0x02, 0x03)
+    if len(data) == 65:
+        return data[0] in (0x04, 0x06, 0x07)
+    return False
+
+def GetScriptType(script):
+    """Classify a scriptPubKey by the standard templates of the node's Solver().
+
+    Returns one of the TX_* constants. As in the node, pay-to-pubkey and
+    pay-to-pubkey-hash scripts must push the key or hash directly, rather
+    than with an OP_PUSHDATA opcode.
+    """
+    script = _as_script(script)
+    size = len(script)
+
+    if (size == 23 and script[0] == OP_HASH160 and script[1] == 20 and
+            script[22] == OP_EQUAL):
+        return TX_SCRIPTHASH
+
+    ops = script.scan()
+    opcodes = ops[0::3]
+    offsets = ops[1::3]
+    lengths = ops[2::3]
+    if size >= 1 and script[0] == OP_RETURN:
+        if (script._scan_error is None and
+                all(opcode <= OP_16 for opcode in opcodes[1:])):
+            return TX_NULL_DATA
+        return TX_NONSTANDARD
+
+    if (size in (35, 67) and script[0] == size - 2 and script[-1] == OP_CHECKSIG and
+            _valid_pubkey_size(script[1:-1])):
+        return TX_PUBKEY
+    if (size == 25 and script[0] == OP_DUP and script[1] == OP_HASH160 and
+            script[2] == 20 and script[23] == OP_EQUALVERIFY and
+            script[24] == OP_CHECKSIG):
+        return TX_PUBKEYHASH
+
+    if script._scan_error is not None:
+        return TX_NONSTANDARD
+    n = len(opcodes)
+    if (n >= 4 and opcodes[-1] == OP_CHECKMULTISIG and
+            OP_1 <= opcodes[0] <= OP_16 and OP_1 <= opcodes[-2] <= OP_16):
+        m = opcodes[0] - OP_1 + 1
+        keys = opcodes[-2] - OP_1 + 1
+        # Like MatchMultisig(), this takes the keys from any push opcode.
+        if (m <= keys and n == keys + 3 and
+                all(opcode <= OP_PUSHDATA4 and
+                    _valid_pubkey_size(script[offset:offset + length])
+                    for (opcode, offset, length) in zip(
+                        opcodes[1:-2], offsets[1:-2], lengths[1:-2]))):
+            return TX_MULTISIG
+    return TX_NONSTANDARD
+
+def ClassifyBlockOutputs(block):
+    """Count the outputs of each standard type (see GetScriptType) in a block."""
+    return Counter(
+        GetScriptType(txout.scriptPubKey) for tx in block.vtx for txout in tx.vout)
+
+
 SIGHASH_ALL = 1
 SIGHASH_NONE = 2
 SIGHASH_SINGLE = 3
 SIGHASH_ANYONECANPAY = 0x80
 
 def getHashPrevouts(tx, person=b'ZcashPrevoutHash'):
-    digest = blake2b(digest_size=32, person=person)
-    for x in tx.vin:
-        digest.update(x.prevout.serialize())
-    return digest.digest()
+    return digest_many(person, (x.prevout.serialize() for x in tx.vin))
 
 def getHashSequence(tx, person=b'ZcashSequencHash'):
-    digest = blake2b(digest_size=32, person=person)
-    for x in tx.vin:
-        digest.update(struct.pack('<I', x.nSequence))
-    return digest.digest()
+    return digest_many(person, (struct.pack('<I', x.nSequence) for x in tx.vin))
 
 def getHashOutputs(tx, person=b'ZcashOutputsHash'):
-    digest = blake2b(digest_size=32, person=person)
-    for x in tx.vout:
-        digest.update(x.serialize())
-    return digest.digest()
+    return digest_many(person, (x.serialize() for x in tx.vout))
 
 def getHashJoinSplits(tx):
-    digest = blake2b(digest_size=32, person=b'ZcashJSplitsHash')
+    digest = blake2b_personalized(b'ZcashJSplitsHash')
     for jsdesc in tx.vJoinSplit:
         digest.update(jsdesc.serialize())
     digest.update(tx.joinSplitPubKey)
     return digest.digest()
 
 def getHashShieldedSpends(tx):
-    digest = blake2b(digest_size=32, person=b'ZcashSSpendsHash')
+    digest = blake2b_personalized(b'ZcashSSpendsHash')
     for desc in tx.shieldedSpends:
         # We don't pass in serialized form of desc as spendAuthSig is not part of the hash
         digest.update(ser_uint256(desc.cv))
@@ -865,19 +1005,54 @@ def getHashShieldedSpends(tx):
     return digest.digest()
 
 def getHashShieldedOutputs(tx):
-    digest = blake2b(digest_size=32, person=b'ZcashSOutputHash')
+    digest = blake2b_personalized(b'ZcashSOutputHash')
     for desc in tx.shieldedOutputs:
         digest.update(desc.serialize())
     return digest.digest()
 
 
-def SignatureHash(script, txTo, inIdx, hashtype, amount, consensusBranchId):
-    """Consensus-correct SignatureHash"""
+class PrecomputedTxData(object):
+    """Digests (and, for pre-Overwinter signature hashes, serialized fields)
+    shared by the signature hashes of all inputs of a transaction
+
+    Computing these once per transaction, rather than once per input, makes
+    signing every input of a transaction linear rather than quadratic in its
+    number of inputs. Pass the same instance to SignatureHash() (or
+    zip244.signature_digest()) for each input.
+
+    None of the cached digests commit to scriptSigs, so the instance stays
+    valid while inputs are being signed, but it must be rebuilt if any other
+    part of the transaction (or, for zip244, the spent outputs) changes.
+    """
+    def __init__(self, tx):
+        self.tx = tx
+        self._digests = {}
+
+    def digest(self, name, f):
+        """Return f(tx), computing it only the first time name is requested."""
+        try:
+            return self._digests[name]
+        except KeyError:
+            value = self._digests[name] = f(self.tx)
+            return value
+
+
+def SignatureHash(script, txTo, inIdx, hashtype, amount, consensusBranchId, precomputed=None):
+    """Consensus-correct SignatureHash
+
+    precomputed - optional PrecomputedTxData for txTo, shared between calls
+    for different inputs or hashtypes.
+    """
     if inIdx >= len(txTo.vin):
         raise ValueError("inIdx %d out of range (%d)" % (inIdx, len(txTo.vin)))
 
     if consensusBranchId != 0:
         # ZIP 243
+        if precomputed is None:
+            precomputed = PrecomputedTxData(txTo)
+        else:
+            assert precomputed.tx is txTo
+
         hashPrevouts = b'\x00'*32
         hashSequence = b'\x00'*32
         hashOutputs = b'\x00'*32
@@ -886,35 +1061,32 @@ def SignatureHash(script, txTo, inIdx, hashtype, amount, consensusBranchId):
         hashShieldedOutputs = b'\x00'*32
 
         if not (hashtype & SIGHASH_ANYONECANPAY):
-            hashPrevouts = getHashPrevouts(txTo)
+            hashPrevouts = precomputed.digest('hashPrevouts', getHashPrevouts)
 
         if (not (hashtype & SIGHASH_ANYONECANPAY)) and \
             (hashtype & 0x1f) != SIGHASH_SINGLE and \
             (hashtype & 0x1f) != SIGHASH_NONE:
-            hashSequence = getHashSequence(txTo)
+            hashSequence = precomputed.digest('hashSequence', getHashSequence)
 
         if (hashtype & 0x1f) != SIGHASH_SINGLE and \
             (hashtype & 0x1f) != SIGHASH_NONE:
-            hashOutputs = getHashOutputs(txTo)
+            hashOutputs = precomputed.digest('hashOutputs', getHashOutputs)
         elif (hashtype & 0x1f) == SIGHASH_SINGLE and \
             0 <= inIdx and inIdx < len(txTo.vout):
-            digest = blake2b(digest_size=32, person=b'ZcashOutputsHash')
+            digest = blake2b_personalized(b'ZcashOutputsHash')
             digest.update(txTo.vout[inIdx].serialize())
             hashOutputs = digest.digest()
 
         if len(txTo.vJoinSplit) > 0:
-            hashJoinSplits = getHashJoinSplits(txTo)
+            hashJoinSplits = precomputed.digest('hashJoinSplits', getHashJoinSplits)
 
         if len(txTo.shieldedSpends) > 0:
-            hashShieldedSpends = getHashShieldedSpends(txTo)
+            hashShieldedSpends = precomputed.digest('hashShieldedSpends', getHashShieldedSpends)
 
         if len(txTo.shieldedOutputs) > 0:
-            hashShieldedOutputs = getHashShieldedOutputs(txTo)
+            hashShieldedOutputs = precomputed.digest('hashShieldedOutputs', getHashShieldedOutputs)
 
-        digest = blake2b(
-            digest_size=32,
-            person=b'ZcashSigHash' + struct.pack('<I', consensusBranchId),
-        )
+        digest = blake2b_personalized(b'ZcashSigHash' + struct.pack('<I', consensusBranchId))
 
         digest.update(struct.pack('<I', (int(txTo.fOverwintered)<<31) | txTo.nVersion))
         digest.update(struct.pack('<I', txTo.nVersionGroupId))
@@ -938,42 +1110,233 @@ def SignatureHash(script, txTo, inIdx, hashtype, amount, consensusBranchId):
         return (digest.digest(), None)
     else:
         # Pre-Overwinter
-        txtmp = CTransaction(txTo)
-
-        for txin in txtmp.vin:
-            txin.scriptSig = b''
-        txtmp.vin[inIdx].scriptSig = script
+        # Serialize txTo as modified for the hashtype, without copying or
+        # modifying it: every scriptSig is replaced by an empty script except
+        # the one being signed, which is replaced by `script`.
+        if precomputed is None:
+            precomputed = PrecomputedTxData(txTo)
+        else:
+            assert precomputed.tx is txTo
 
-        if (hashtype & 0x1f) == SIGHASH_NONE:
-            txtmp.vout = []
+        if (hashtype & 0x1f) == SIGHASH_SINGLE and inIdx >= len(txTo.vout):
+            raise ValueError("outIdx %d out of range (%d)" % (inIdx, len(txTo.vout)))
 
-            for i in range(len(txtmp.vin)):
-                if i != inIdx:
-                    txtmp.vin[i].nSequence = 0
+        # SIGHASH_NONE and SIGHASH_SINGLE let other inputs be updated.
+        blankSequences = (hashtype & 0x1f) in (SIGHASH_NONE, SIGHASH_SINGLE)
+        if hashtype & SIGHASH_ANYONECANPAY:
+            inputs = [inIdx]
+        else:
+            inputs = range(len(txTo.vin))
+
+        # The pieces of the preimage are joined once at the end, so that
+        # building it is linear in the size of the transaction.
+        s = [
+            precomputed.digest('legacyHead', lambda tx: tx.serialize_parts()[0]),
+            ser_compact_size(len(inputs)),
+        ]
+        for i in inputs:
+            txin = txTo.vin[i]
+            s.append(txin.prevout.serialize())
+            if i == inIdx:
+                s.append(ser_string(script))
+                s.append(struct.pack("<I", txin.nSequence))
+            else:
+                s.append(ser_string(b''))
+                s.append(struct.pack("<I", 0 if blankSequences else txin.nSequence))
 
+        if (hashtype & 0x1f) == SIGHASH_NONE:
+            s.append(ser_compact_size(0))
         elif (hashtype & 0x1f) == SIGHASH_SINGLE:
-            outIdx = inIdx
-            if outIdx >= len(txtmp.vout):
-                raise ValueError("outIdx %d out of range (%d)" % (outIdx, len(txtmp.vout)))
-
-            tmp = txtmp.vout[outIdx]
-            txtmp.vout = []
-            for i in range(outIdx):
-                txtmp.vout.append(CTxOut())
-            txtmp.vout.append(tmp)
+            # Outputs before the one being signed are blanked, as in the
+            # node, where a null CTxOut has a value of -1.
+            s.append(ser_compact_size(inIdx + 1))
+            s.append(CTxOut(-1).serialize() * inIdx)
+            s.append(txTo.vout[inIdx].serialize())
+        else:
+            s.append(precomputed.digest('legacyOutputs', lambda tx: ser_vector(tx.vout)))
 
-            for i in range(len(txtmp.vin)):
-                if i != inIdx:
-                    txtmp.vin[i].nSequence = 0
+        s.append(precomputed.digest('legacyTail', lambda tx: tx.serialize_parts()[1]))
+        s.append(struct.pack(b"<I", hashtype))
 
-        if hashtype & SIGHASH_ANYONECANPAY:
-            tmp = txtmp.vin[inIdx]
-            txtmp.vin = []
-            txtmp.vin.append(tmp)
+        hash = hash256(b''.join(s))
 
-        s = txtmp.serialize()
-        s += struct.pack(b"<I", hashtype)
+        return (hash, None)
 
-        hash = hash256(s)
 
-        return (hash, None)
+SIGHASH_JSON = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'src', 'test', 'data', 'sighash.json')
+
+SIGHASH_TYPES = [SIGHASH_ALL, SIGHASH_NONE, SIGHASH_SINGLE]
+SIGHASH_TYPES += [hashtype | SIGHASH_ANYONECANPAY for hashtype in SIGHASH_TYPES]
+
+def _sighash_vectors():
+    # The vectors in sighash.json whose transactions have no JoinSplits or
+    # Sapling spends and outputs, which the framework cannot hash, as
+    # (tx, script, input index, hashtype, branch id, expected hash).
+    with open(SIGHASH_JSON, encoding='utf8') as f:
+        vectors = json.load(f)
+    for vector in vectors:
+        if len(vector) == 1:
+            # A comment
+            continue
+        (raw_tx, raw_script, nIn, hashtype, branch_id, expected) = vector
+        tx = CTransaction()
+        tx.deserialize(BytesIO(bytes.fromhex(raw_tx)))
+        if tx.vJoinSplit or tx.shieldedSpends or tx.shieldedOutputs:
+            continue
+        if not tx.fOverwintered:
+            # The node ignores the branch id of pre-Overwinter transactions.
+            branch_id = 0
+        # The hashtype is a signed 32-bit integer in the vectors.
+        yield (tx, CScript(bytes.fromhex(raw_script)), nIn, hashtype & 0xffffffff,
+               branch_id, expected)
+
+def _legacy_signature_hash_by_copy(script, txTo, inIdx, hashtype):
+    # The pre-Overwinter SignatureHash as it was before it serialized the
+    # preimage in place: modify a copy of txTo and serialize that. (Except
+    # that blanked outputs have a value of -1, as in the node.)
+    txtmp = CTransaction(txTo)
+
+    for txin in txtmp.vin:
+        txin.scriptSig = b''
+    txtmp.vin[inIdx].scriptSig = script
+
+    if (hashtype & 0x1f) == SIGHASH_NONE:
+        txtmp.vout = []
+
+        for i in range(len(txtmp.vin)):
+            if i != inIdx:
+                txtmp.vin[i].nSequence = 0
+
+    elif (hashtype & 0x1f) == SIGHASH_SINGLE:
+        outIdx = inIdx
+        if outIdx >= len(txtmp.vout):
+            raise ValueError("outIdx %d out of range (%d)" % (outIdx, len(txtmp.vout)))
+
+        tmp = txtmp.vout[outIdx]
+        txtmp.vout = []
+        for i in range(outIdx):
+            txtmp.vout.append(CTxOut(-1))
+        txtmp.vout.append(tmp)
+
+        for i in range(len(txtmp.vin)):
+            if i != inIdx:
+                txtmp.vin[i].nSequence = 0
+
+    if hashtype & SIGHASH_ANYONECANPAY:
+        tmp = txtmp.vin[inIdx]
+        txtmp.vin = []
+        txtmp.vin.append(tmp)
+
+    s = txtmp.serialize()
+    s += struct.pack(b"<I", hashtype)
+
+    return hash256(s)
+
+class TestFrameworkScript(unittest.TestCase):
+    def test_script_type(self):
+        key33 = bytes([0x02]) + bytes(range(32))
+        key65 = bytes([0x04]) + bytes(range(64))
+        keyhash = bytes(range(20))
+
+        def pushdata1(data):
+            return bytes([OP_PUSHDATA1, len(data)]) + data
+
+        self.assertEqual(GetScriptType(CScript([key33, OP_CHECKSIG])), TX_PUBKEY)
+        self.assertEqual(GetScriptType(CScript([key65, OP_CHECKSIG])), TX_PUBKEY)
+        self.assertEqual(GetScriptType(
+            CScript([OP_DUP, OP_HASH160, keyhash, OP_EQUALVERIFY, OP_CHECKSIG])), TX_PUBKEYHASH)
+        self.assertEqual(GetScriptType(CScript([OP_HASH160, keyhash, OP_EQUAL])), TX_SCRIPTHASH)
+        self.assertEqual(GetScriptType(
+            CScript([OP_1, key33, key65, OP_2, OP_CHECKMULTISIG])), TX_MULTISIG)
+        self.assertEqual(GetScriptType(CScript([OP_RETURN, b'data', OP_16])), TX_NULL_DATA)
+        self.assertEqual(GetScriptType(CScript([OP_RETURN, OP_NOP])), TX_NONSTANDARD)
+        self.assertEqual(GetScriptType(b''), TX_NONSTANDARD)
+
+        # Non-minimal pushes of a key or key hash.
+        self.assertEqual(GetScriptType(pushdata1(key33) + bytes([OP_CHECKSIG])), TX_NONSTANDARD)
+        self.assertEqual(GetScriptType(pushdata1(key65) + bytes([OP_CHECKSIG])), TX_NONSTANDARD)
+        self.assertEqual(GetScriptType(
+            bytes([OP_DUP, OP_HASH160]) + pushdata1(keyhash) + bytes([OP_EQUALVERIFY, OP_CHECKSIG])),
+            TX_NONSTANDARD)
+
+        # Keys whose first byte does not match their length.
+        for prefix in (0x00, 0x04, 0x06, 0x07):
+            key = bytes([prefix]) + key33[1:]
+            self.assertEqual(GetScriptType(CScript([key, OP_CHECKSIG])), TX_NONSTANDARD)
+            self.assertEqual(GetScriptType(
+                CScript([OP_1, key, OP_1, OP_CHECKMULTISIG])), TX_NONSTANDARD)
+        for prefix in (0x00, 0x02, 0x03, 0x05):
+            key = bytes([prefix]) + key65[1:]
+            self.assertEqual(GetScriptType(CScript([key, OP_CHECKSIG])), TX_NONSTANDARD)
+            self.assertEqual(GetScriptType(
+                CScript([OP_1, key, OP_1, OP_CHECKMULTISIG])), TX_NONSTANDARD)
+        for key in (bytes([0x03]) + key33[1:], bytes([0x06]) + key65[1:], bytes([0x07]) + key65[1:]):
+            self.assertEqual(GetScriptType(CScript([key, OP_CHECKSIG])), TX_PUBKEY)
+
+        # MatchMultisig() takes its keys from any push opcode.
+        self.assertEqual(GetScriptType(
+            bytes([OP_1]) + pushdata1(key33) + bytes([OP_1, OP_CHECKMULTISIG])), TX_MULTISIG)
+        self.assertEqual(GetScriptType(
+            CScript([OP_2, key33, OP_1, OP_CHECKMULTISIG])), TX_NONSTANDARD)
+
+    def test_sighash_vectors(self):
+        if not os.path.exists(SIGHASH_JSON):
+            self.skipTest('%s not found' % SIGHASH_JSON)
+        checked = 0
+        for (tx, script, nIn, hashtype, branch_id, expected) in _sighash_vectors():
+            if tx.fOverwintered and tx.nVersionGroupId != SAPLING_VERSION_GROUP_ID:
+                # ZIP 143 (Overwinter) signature hashes are not implemented.
+                continue
+            (sighash, _) = SignatureHash(script, tx, nIn, hashtype, 0, branch_id)
+            self.assertEqual(sighash[::-1].hex(), expected)
+            checked += 1
+        self.assertGreater(checked, 0)
+
+    def test_sighash_precomputed(self):
+        if not os.path.exists(SIGHASH_JSON):
+            self.skipTest('%s not found' % SIGHASH_JSON)
+
+        def sighash(tx, script, nIn, hashtype, branch_id, precomputed):
+            try:
+                return SignatureHash(script, tx, nIn, hashtype, 0, branch_id, precomputed)[0]
+            except ValueError:
+                # SIGHASH_SINGLE without a corresponding output
+                return None
+
+        for (tx, script, _, vector_hashtype, branch_id, _) in _sighash_vectors():
+            precomputed = PrecomputedTxData(tx)
+            for nIn in range(len(tx.vin)):
+                for hashtype in SIGHASH_TYPES + [vector_hashtype]:
+                    self.assertEqual(
+                        sighash(tx, script, nIn, hashtype, branch_id, precomputed),
+                        sighash(tx, script, nIn, hashtype, branch_id, None))
+
+    def test_legacy_sighash_matches_copy(self):
+        if not os.path.exists(SIGHASH_JSON):
+            self.skipTest('%s not found' % SIGHASH_JSON)
+
+        def sighashes(tx, script, nIn, hashtype):
+            try:
+                streamed = SignatureHash(script, tx, nIn, hashtype, 0, 0)[0]
+            except ValueError:
+                streamed = None
+            try:
+                copied = _legacy_signature_hash_by_copy(script, tx, nIn, hashtype)
+            except ValueError:
+                copied = None
+            return (streamed, copied)
+
+        checked = 0
+        for (tx, script, _, vector_hashtype, branch_id, _) in _sighash_vectors():
+            if branch_id != 0:
+                continue
+            serialized = tx.serialize()
+            for nIn in range(len(tx.vin)):
+                for hashtype in SIGHASH_TYPES + [vector_hashtype]:
+                    (streamed, copied) = sighashes(tx, script, nIn, hashtype)
+                    self.assertEqual(streamed, copied)
+                    checked += 1
+            # Neither implementation modifies the transaction.
+            self.assertEqual(tx.serialize(), serialized)
+        self.assertGreater(checked, 0)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# Copyright (c) 2026 The Zcash developers
+# Distributed under the MIT software license, see the accompanying
+# file COPYING or https://www.opensource.org/licenses/mit-license.php .
+
+#
+# solutioncache.py
+#
+# SolutionCache: an on-disk cache of solved block headers, so that tests that
+#                build the same blocks on every run only need to solve
+#                Equihash for them once.
+#
+
+import os
+import sqlite3
+import time
+
+# Default number of solutions to keep; the least recently used solutions are
+# evicted beyond this.
+DEFAULT_MAX_ENTRIES = 100000
+
+# How long to wait for another process holding a lock on the cache.
+LOCK_TIMEOUT = 60
+
+# How many cache hits to record the use of in one write.
+TOUCH_BATCH_SIZE = 256
+
+class SolutionCache():
+    '''
+    Maps a 108-byte block header prefix and Equihash parameters (n, k) to the
+    nonce and solution found for them.
+
+    The cache is an SQLite database, so any number of test processes can
+    share one file. Each process opens its own connection on first use.
+
+    Hits are only read from the database; the times they were last used are
+    written in batches (on put(), every TOUCH_BATCH_SIZE hits, and on
+    close()), so that lookups do not contend for the write lock.
+    '''
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._db = None
+        self._pid = None
+        self._touched = {}
+
+    def _conn(self):
+        # A connection must not be used across a fork, so reopen it in
+        # child processes.
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+            self._pid = os.getpid()
+            self._touched = {}
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS solutions ('
+                ' header BLOB NOT NULL,'
+                ' n INTEGER NOT NULL,'
+                ' k INTEGER NOT NULL,'
+                ' nonce BLOB NOT NULL,'
+                ' solution BLOB NOT NULL,'
+                ' last_used INTEGER NOT NULL,'
+                ' PRIMARY KEY (header, n, k))')
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used)')
+        return self._db
+
+    def get(self, header, n, k):
+        '''
+        Return the cached (nNonce, nSolution) for the header, or None.
+        '''
+        db = self._conn()
+        row = db.execute(
+            'SELECT nonce, solution FROM solutions WHERE header = ? AND n = ? AND k = ?',
+            (bytes(header), n, k)).fetchone()
+        if row is None:
+            return None
+        self._touched[(bytes(header), n, k)] = time.time_ns()
+        if len(self._touched) >= TOUCH_BATCH_SIZE:
+            self._write(lambda db: None)
+        return (int.from_bytes(row[0], 'little'), bytearray(row[1]))
+
+    def put(self, header, n, k, nonce, solution):
+        '''
+        Store the solution for the header, evicting the least recently used
+        entries if the cache is full.
+        '''
+        def insert(db):
+            db.execute(
+                'INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?)',
+                (bytes(header), n, k, nonce.to_bytes(32, 'little'),
+                 bytes(solution), time.time_ns()))
+            db.execute(
+                'DELETE FROM solutions WHERE rowid IN ('
+                ' SELECT rowid FROM solutions ORDER BY last_used DESC'
+                ' LIMIT -1 OFFSET ?)',
+                (self.max_entries,))
+        self._write(insert)
+
+    def _write(self, f):
+        # Run f(db) in a write transaction, after recording the pending hits.
+        db = self._conn()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(
+                'UPDATE solutions SET last_used = MAX(last_used, ?)'
+                ' WHERE header = ? AND n = ? AND k = ?',
+                [(last_used,) + key for (key, last_used) in self._touched.items()])
+            f(db)
+            db.execute('COMMIT')
+        except sqlite3.Error:
+            db.execute('ROLLBACK')
+            raise
+        self._touched = {}
+
+    def close(self):
+        if self._db is not None:
+            if self._touched and self._pid == os.getpid():
+                self._write(lambda db: None)
+            self._db.close()
+            self._db = None
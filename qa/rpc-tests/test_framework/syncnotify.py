@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# Copyright (c) 2026 The Zcash developers
+# Distributed under the MIT software license, see the accompanying
+# file COPYING or https://www.opensource.org/licenses/mit-license.php .
+
+#
+# syncnotify.py
+#
+# SyncNotifier: a ZMQ subscription to the hashblock and hashtx notifications
+#     of a set of nodes, which sync_blocks and sync_mempools wait on between
+#     checks, so that they wake up as soon as a node connects a block or
+#     accepts a transaction. BitcoinTestFramework.setup_nodes starts the
+#     nodes with the arguments from zmq_notify_args(util.zmq_port(i)) and
+#     creates one for sync_all if pyzmq is installed; without it (or if
+#     zcashd was built without ZMQ) the sync functions only poll.
+#
+
+try:
+    import zmq
+except ImportError:
+    # pyzmq is optional; without it there are no notifications to wait on.
+    zmq = None
+
+def zmq_notify_args(port):
+    '''The arguments with which a node publishes its notifications on port.'''
+    address = 'tcp://127.0.0.1:%d' % port
+    return ['-zmqpubhashblock=' + address, '-zmqpubhashtx=' + address]
+
+class SyncNotifier():
+    def __init__(self, ports):
+        if zmq is None:
+            raise ImportError('SyncNotifier requires the zmq module (pyzmq)')
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.SUB)
+        self.socket.setsockopt(zmq.SUBSCRIBE, b"hashblock")
+        self.socket.setsockopt(zmq.SUBSCRIBE, b"hashtx")
+        # The subscription reconnects by itself when a node is restarted.
+        for port in ports:
+            self.socket.connect('tcp://127.0.0.1:%d' % port)
+
+    def wait(self, timeout):
+        '''
+        Wait up to timeout seconds for a notification. Return whether there
+        was one, after discarding all those that arrived.
+        '''
+        if not self.socket.poll(int(timeout * 1000)):
+            return False
+        while self.socket.poll(0):
+            self.socket.recv_multipart()
+        return True
+
+    def close(self):
+        self.socket.close(linger=0)
+        self.context.term()
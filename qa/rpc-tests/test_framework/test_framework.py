@@ -14,7 +14,11 @@ import shutil
 import tempfile
 import traceback
 
+from . import syncnotify
 from .authproxy import JSONRPCException
+from .testkeys import enable_key_pool_cache
+from .mininode import disable_solution_cache, enable_solution_cache
+from .rpctrace import TRACER
 from .util import (
     ZCASHD_BINARY,
     initialize_chain,
@@ -26,12 +30,29 @@ from .util import (
     wait_bitcoinds,
     enable_coverage,
     check_json_precision,
+    zmq_port,
     PortSeed,
 )
 
+SOLUTION_CACHE_FILENAME = 'equihash_solutions.sqlite'
+
 
 class BitcoinTestFramework(object):
 
+    # Whether setup_nodes starts the nodes with ZMQ block and transaction
+    # notifications on zmq_port(i), and sets sync_notifier to a
+    # syncnotify.SyncNotifier for them that sync_all waits on. This needs
+    # pyzmq (without it, sync_all only polls) and zcashd built with ZMQ, so
+    # tests opt in.
+    sync_notify = False
+    sync_notifier = None
+
+    # Whether Equihash solutions of blocks built by the test are cached on
+    # disk (in SOLUTION_CACHE_FILENAME in the cache directory, unless
+    # --solutioncache gives a file), for tests that build the same blocks on
+    # every run.
+    solution_cache = False
+
     def __init__(self):
         self.num_nodes = 4
         self.cache_behavior = 'current'
@@ -48,7 +69,13 @@ class BitcoinTestFramework(object):
         initialize_chain(self.options.tmpdir, self.num_nodes, self.options.cachedir, self.cache_behavior)
 
     def setup_nodes(self):
-        return start_nodes(self.num_nodes, self.options.tmpdir)
+        extra_args = None
+        if self.sync_notify and syncnotify.zmq is not None:
+            ports = [zmq_port(i) for i in range(self.num_nodes)]
+            if self.sync_notifier is None:
+                self.sync_notifier = syncnotify.SyncNotifier(ports)
+            extra_args = [syncnotify.zmq_notify_args(port) for port in ports]
+        return start_nodes(self.num_nodes, self.options.tmpdir, extra_args)
 
     def setup_network(self, split = False, do_mempool_sync = True):
         self.nodes = self.setup_nodes()
@@ -64,9 +91,9 @@ class BitcoinTestFramework(object):
             connect_nodes_bi(self.nodes, 2, 3)
             if not split:
                 connect_nodes_bi(self.nodes, 1, 2)
-                sync_blocks(self.nodes[1:3])
+                sync_blocks(self.nodes[1:3], notifier=self.sync_notifier)
                 if do_mempool_sync:
-                    sync_mempools(self.nodes[1:3])
+                    sync_mempools(self.nodes[1:3], notifier=self.sync_notifier)
 
         self.is_network_split = split
         self.sync_all(do_mempool_sync)
@@ -82,15 +109,15 @@ class BitcoinTestFramework(object):
 
     def sync_all(self, do_mempool_sync = True):
         if self.is_network_split:
-            sync_blocks(self.nodes[:2])
-            sync_blocks(self.nodes[2:])
+            sync_blocks(self.nodes[:2], notifier=self.sync_notifier)
+            sync_blocks(self.nodes[2:], notifier=self.sync_notifier)
             if do_mempool_sync:
-                sync_mempools(self.nodes[:2])
-                sync_mempools(self.nodes[2:])
+                sync_mempools(self.nodes[:2], notifier=self.sync_notifier)
+                sync_mempools(self.nodes[2:], notifier=self.sync_notifier)
         else:
-            sync_blocks(self.nodes)
+            sync_blocks(self.nodes, notifier=self.sync_notifier)
             if do_mempool_sync:
-                sync_mempools(self.nodes)
+                sync_mempools(self.nodes, notifier=self.sync_notifier)
 
     def join_network(self):
         """
@@ -120,6 +147,10 @@ class BitcoinTestFramework(object):
                           help="The seed to use for assigning port numbers (default: current process id)")
         parser.add_option("--coveragedir", dest="coveragedir",
                           help="Write tested RPC commands into this directory")
+        parser.add_option("--rpcstats", dest="rpcstats",
+                          help="Write per-node RPC call statistics to this file as JSON, and print a summary")
+        parser.add_option("--solutioncache", dest="solutioncache",
+                          help="Cache Equihash solutions of blocks built by the test in this file (default: %s in the cache directory, if the test enables the cache)" % SOLUTION_CACHE_FILENAME)
         self.add_options(parser)
         (self.options, self.args) = parser.parse_args()
 
@@ -131,6 +162,13 @@ class BitcoinTestFramework(object):
         if self.options.coveragedir:
             enable_coverage(self.options.coveragedir)
 
+        if self.options.solutioncache is None and self.solution_cache:
+            os.makedirs(self.options.cachedir, exist_ok=True)
+            self.options.solutioncache = os.path.join(self.options.cachedir, SOLUTION_CACHE_FILENAME)
+        if self.options.solutioncache:
+            enable_solution_cache(self.options.solutioncache)
+        enable_key_pool_cache(self.options.cachedir)
+
         PortSeed.n = self.options.port_seed
 
         os.environ['PATH'] = self.options.srcdir+":"+os.environ['PATH']
@@ -166,10 +204,20 @@ class BitcoinTestFramework(object):
         else:
             print("Note: bitcoinds were not stopped and may still be running")
 
+        if self.sync_notifier is not None:
+            self.sync_notifier.close()
+        disable_solution_cache()
+
         if not self.options.nocleanup and not self.options.noshutdown:
             print("Cleaning up")
             shutil.rmtree(self.options.tmpdir)
 
+        TRACER.flush()
+        if self.options.rpcstats:
+            TRACER.write_json(self.options.rpcstats)
+            print("RPC statistics (written to %s):" % self.options.rpcstats)
+            print(TRACER.summary_table())
+
         if success:
             print("Tests successful")
             sys.exit(0)
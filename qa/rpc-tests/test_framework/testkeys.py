@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# Copyright (c) 2026 The Zcash developers
+# Distributed under the MIT software license, see the accompanying
+# file COPYING or https://www.opensource.org/licenses/mit-license.php .
+
+#
+# testkeys.py
+#
+# KeyPool: deterministic transparent keys derived from a seed, for tests that
+#          need many distinct keys. Deriving a public key costs an EC point
+#          multiplication, so the derived keys are kept in a cache file and
+#          later runs only read them back.
+#
+# TestKey: one key of a pool (secret, compressed pubkey, hash160), with its
+#          P2PKH scriptPubKey and a CECKey for signing, which is built from
+#          the stored public key rather than derived again.
+#
+
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from collections import namedtuple
+
+from .key import CECKey
+from .script import (
+    CScript,
+    OP_CHECKSIG,
+    OP_DUP,
+    OP_EQUALVERIFY,
+    OP_HASH160,
+)
+
+# If set, the directory in which pools without an explicit path keep their
+# cache files.
+KEY_POOL_DIR = None
+
+def enable_key_pool_cache(directory):
+    """Cache the keys of seeded pools in files in the given directory."""
+    global KEY_POOL_DIR
+    KEY_POOL_DIR = directory
+
+# The fewest keys derived at a time. Pools also at least double in size each
+# time they grow, so that handing out keys one by one does not rewrite the
+# cache file for every key.
+MIN_DERIVE_BATCH = 64
+
+# The order of the secp256k1 group.
+SECP256K1_ORDER = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+
+# Cache files start with a magic string and the SHA-256 of the seed, followed
+# by fixed-size records of (secret, compressed pubkey, hash160).
+CACHE_MAGIC = b'zcashkeypool1'
+RECORD_SIZE = 32 + 33 + 20
+
+def hash160(s):
+    return hashlib.new('ripemd160', hashlib.sha256(s).digest()).digest()
+
+def derive_secret(seed, index):
+    '''The secret of the key at `index` in the pool for `seed`.'''
+    counter = 0
+    while True:
+        secret = hashlib.sha256(seed + struct.pack('<II', index, counter)).digest()
+        if 0 < int.from_bytes(secret, 'big') < SECP256K1_ORDER:
+            return secret
+        counter += 1
+
+class TestKey(namedtuple('TestKey', ['secret', 'pubkey', 'hash160'])):
+    __slots__ = ()
+
+    @property
+    def script_pubkey(self):
+        return CScript([OP_DUP, OP_HASH160, self.hash160, OP_EQUALVERIFY, OP_CHECKSIG])
+
+    def key(self):
+        '''A new compressed CECKey for this key.'''
+        key = CECKey()
+        key.set_keypair(self.secret, self.pubkey)
+        key.set_compressed(True)
+        return key
+
+    @classmethod
+    def derive(cls, secret):
+        key = CECKey()
+        key.set_secretbytes(secret)
+        key.set_compressed(True)
+        pubkey = key.get_pubkey()
+        return cls(secret, pubkey, hash160(pubkey))
+
+class KeyPool(object):
+    '''
+    The keys derived from a seed. pool[i] is always the same key for the
+    same seed; keys are derived (or read from the cache file) the first time
+    they are needed, and next_key() hands them out in order.
+
+    `path` is the cache file; by default it is a file named after the seed
+    in KEY_POOL_DIR, and there is no cache if that is not set.
+    '''
+
+    def __init__(self, seed, path=None):
+        self.seed = bytes(seed)
+        self.path = path
+        self._keys = []
+        self._loaded = False
+        self._next = 0
+
+    def _cache_path(self):
+        if self.path is not None:
+            return self.path
+        if KEY_POOL_DIR is None:
+            return None
+        return os.path.join(
+            KEY_POOL_DIR, 'keypool-%s.bin' % hashlib.sha256(self.seed).hexdigest()[:16])
+
+    def _cache_header(self):
+        return CACHE_MAGIC + hashlib.sha256(self.seed).digest()
+
+    def _load(self):
+        self._loaded = True
+        path = self._cache_path()
+        if path is None:
+            return
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        header = self._cache_header()
+        if not data.startswith(header):
+            return
+        for offset in range(len(header), len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+            record = data[offset:offset + RECORD_SIZE]
+            self._keys.append(TestKey(record[:32], record[32:65], record[65:]))
+
+    def _save(self):
+        path = self._cache_path()
+        if path is None:
+            return
+        # Write a complete new file and rename it over the old one, so that
+        # concurrent tests never see a partly written cache.
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        (fd, tmp) = tempfile.mkstemp(dir=directory, prefix='.keypool')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._cache_header())
+                for k in self._keys:
+                    f.write(k.secret + k.pubkey + k.hash160)
+            os.replace(tmp, path)
+        except:
+            os.unlink(tmp)
+            raise
+
+    def ensure(self, n):
+        '''Make sure the first n keys are available.'''
+        if not self._loaded:
+            self._load()
+        if len(self._keys) >= n:
+            return
+        n = max(n, len(self._keys) + MIN_DERIVE_BATCH, 2 * len(self._keys))
+        for index in range(len(self._keys), n):
+            self._keys.append(TestKey.derive(derive_secret(self.seed, index)))
+        self._save()
+
+    def __getitem__(self, index):
+        if index < 0:
+            raise IndexError('key pools have no end')
+        self.ensure(index + 1)
+        return self._keys[index]
+
+    def keys(self, n):
+        '''The first n keys of the pool.'''
+        self.ensure(n)
+        return self._keys[:n]
+
+    def next_key(self):
+        '''The first key that this method has not returned yet.'''
+        key = self[self._next]
+        self._next += 1
+        return key
+
+
+class TestFrameworkTestKeys(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='testkeys')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_pool(self):
+        path = os.path.join(self.tmpdir, 'pool.bin')
+        pool = KeyPool(b'seed', path)
+        keys = pool.keys(3)
+        self.assertEqual(len(set(k.pubkey for k in keys)), 3)
+        self.assertEqual([pool.next_key(), pool.next_key()], keys[:2])
+        self.assertEqual(keys[0], TestKey.derive(derive_secret(b'seed', 0)))
+
+        # A new pool for the same seed reads the keys back from the cache.
+        reloaded = KeyPool(b'seed', path)
+        self.assertEqual(reloaded.keys(MIN_DERIVE_BATCH + 1)[:3], keys)
+        self.assertNotEqual(KeyPool(b'other', path)[0], keys[0])
+
+    def test_key(self):
+        hash = hashlib.sha256(b'message').digest()
+        for k in KeyPool(b'seed').keys(4):
+            key = k.key()
+            self.assertEqual(key.get_pubkey(), k.pubkey)
+            derived = CECKey()
+            derived.set_secretbytes(k.secret)
+            self.assertTrue(derived.verify(hash, key.sign(hash)))
@@ -25,8 +25,9 @@ import tempfile
 import time
 import re
 import errno
+from concurrent.futures import ThreadPoolExecutor
 
-from . import coverage
+from . import coverage, rpctrace
 from .authproxy import AuthServiceProxy, JSONRPCException
 
 ZCASHD_BINARY = os.path.join('src', 'zcashd')
@@ -65,6 +66,7 @@ def enable_coverage(dirname):
     """Maintain a log of which RPC calls are made during testing."""
     global COVERAGE_DIR
     COVERAGE_DIR = dirname
+    rpctrace.TRACER.add_consumer(coverage.CoverageLog(dirname))
 
 
 def get_rpc_proxy(url, node_number, timeout=None):
@@ -84,13 +86,9 @@ def get_rpc_proxy(url, node_number, timeout=None):
     if timeout is not None:
         proxy_kwargs['timeout'] = timeout
 
-    proxy = AuthServiceProxy(url, **proxy_kwargs)
+    proxy = AuthServiceProxy(url, tracer=rpctrace.TRACER.for_node(node_number), **proxy_kwargs)
     proxy.url = url  # store URL on proxy for info
-
-    coverage_logfile = coverage.get_filename(
-        COVERAGE_DIR, node_number) if COVERAGE_DIR else None
-
-    return coverage.AuthServiceProxyWrapper(proxy, coverage_logfile)
+    return proxy
 
 
 def p2p_port(n):
@@ -100,6 +98,9 @@ def p2p_port(n):
 def rpc_port(n):
     return PORT_MIN + PORT_RANGE + n + (MAX_NODES * PortSeed.n) % (PORT_RANGE - 1 - MAX_NODES)
 
+def zmq_port(n):
+    return PORT_MIN + 2 * PORT_RANGE + n + (MAX_NODES * PortSeed.n) % (PORT_RANGE - 1 - MAX_NODES)
+
 def check_json_precision():
     """Make sure json library being used does not lose precision converting BTC values"""
     n = Decimal("20000000.00000003")
@@ -116,61 +117,94 @@ def hex_str_to_bytes(hex_str):
 def str_to_b64str(string):
     return b64encode(string.encode('utf-8')).decode('ascii')
 
-def sync_blocks(rpc_connections, wait=0.125, timeout=60, allow_different_tips=False):
+# sync_blocks and sync_mempools check the nodes again after this long at
+# first, and back off up to their `wait` interval.
+MIN_SYNC_POLL = 0.005
+
+_sync_executor = None
+
+def _query_nodes(fn, rpc_connections):
+    """Call fn on each of the connections concurrently; return the results in order."""
+    global _sync_executor
+    if len(rpc_connections) < 2:
+        return [fn(x) for x in rpc_connections]
+    if _sync_executor is None:
+        _sync_executor = ThreadPoolExecutor(max_workers=MAX_NODES, thread_name_prefix='sync')
+    return list(_sync_executor.map(fn, rpc_connections))
+
+def _shutdown_sync_executor():
+    global _sync_executor
+    if _sync_executor is not None:
+        _sync_executor.shutdown()
+        _sync_executor = None
+
+def _wait_for_sync(synced, wait, timeout, notifier):
+    """
+    Wait until synced() is true, checking again after MIN_SYNC_POLL seconds
+    at first, then backing off to `wait`. If a notifier (see syncnotify.py)
+    is given, a notification from a node ends the wait early.
+    """
+    deadline = time.monotonic() + timeout
+    delay = min(MIN_SYNC_POLL, wait)
+    while not synced():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        if notifier is not None and notifier.wait(min(delay, remaining)):
+            delay = min(MIN_SYNC_POLL, wait)
+            continue
+        if notifier is None:
+            time.sleep(min(delay, remaining))
+        delay = min(delay * 2, wait)
+    return True
+
+def sync_blocks(rpc_connections, wait=0.125, timeout=60, allow_different_tips=False, notifier=None):
     """
     Wait until everybody has the same tip, and has notified
     all internal listeners of them.
 
     If allow_different_tips is True, waits until everyone has
     the same block count.
+
+    The nodes are queried concurrently, with one getblockchaininfo call
+    each per check.
     """
-    while timeout > 0:
-        if allow_different_tips:
-            tips = [ x.getblockcount() for x in rpc_connections ]
-        else:
-            tips = [ x.getbestblockhash() for x in rpc_connections ]
-        if tips == [ tips[0] ]*len(tips):
-            break
-        time.sleep(wait)
-        timeout -= wait
+    tip_field = 'blocks' if allow_different_tips else 'bestblockhash'
 
-    # Now that the block counts are in sync, wait for the internal
-    # notifications to finish
-    while timeout > 0:
-        notified = [ x.getblockchaininfo()['fullyNotified'] for x in rpc_connections ]
-        if notified == [ True ] * len(notified):
-            return True
-        time.sleep(wait)
-        timeout -= wait
+    def synced():
+        infos = _query_nodes(lambda x: x.getblockchaininfo(), rpc_connections)
+        tips = [ info[tip_field] for info in infos ]
+        # The tips must match before the notifications are checked.
+        return (tips == [ tips[0] ]*len(tips)
+                and all(info['fullyNotified'] for info in infos))
 
-    raise AssertionError("Block sync failed")
+    if not _wait_for_sync(synced, wait, timeout, notifier):
+        raise AssertionError("Block sync failed")
+    return True
 
-def sync_mempools(rpc_connections, wait=0.5, timeout=60):
+def sync_mempools(rpc_connections, wait=0.5, timeout=60, notifier=None):
     """
     Wait until everybody has the same transactions in their memory
     pools, and has notified all internal listeners of them
-    """
-    while timeout > 0:
-        pool = set(rpc_connections[0].getrawmempool())
-        num_match = 1
-        for i in range(1, len(rpc_connections)):
-            if set(rpc_connections[i].getrawmempool()) == pool:
-                num_match = num_match+1
-        if num_match == len(rpc_connections):
-            break
-        time.sleep(wait)
-        timeout -= wait
 
-    # Now that the mempools are in sync, wait for the internal
-    # notifications to finish
-    while timeout > 0:
-        notified = [ x.getmempoolinfo()['fullyNotified'] for x in rpc_connections ]
-        if notified == [ True ] * len(notified):
-            return True
-        time.sleep(wait)
-        timeout -= wait
-
-    raise AssertionError("Mempool sync failed")
+    The nodes are queried concurrently, with getrawmempool and
+    getmempoolinfo sent as one batch per node per check.
+    """
+    def query(x):
+        with x.batch() as b:
+            txids = b.getrawmempool()
+            info = b.getmempoolinfo()
+        return (txids.result(), info.result())
+
+    def synced():
+        states = _query_nodes(query, rpc_connections)
+        pool = set(states[0][0])
+        return (all(set(txids) == pool for (txids, _) in states[1:])
+                and all(info['fullyNotified'] for (_, info) in states))
+
+    if not _wait_for_sync(synced, wait, timeout, notifier):
+        raise AssertionError("Mempool sync failed")
+    return True
 
 bitcoind_processes = {}
 
@@ -483,6 +517,7 @@ def stop_nodes(nodes):
         except http.client.CannotSendRequest as e:
             print("WARN: Unable to stop node: " + repr(e))
     del nodes[:] # Emptying array closes connections as a side effect
+    _shutdown_sync_executor()
 
 def set_node_times(nodes, t):
     for node in nodes:
@@ -11,15 +11,20 @@
 # This file is modified from zcash/zcash-test-vectors.
 #
 
+import json
+import os
 import struct
+import unittest
+from io import BytesIO
 
-from hashlib import blake2b
-
-from .mininode import ser_string, ser_uint256
+from .hashing import blake2b_personalized, digest_many
+from .mininode import CTransaction, ser_string, ser_uint256
 from .script import (
+    SIGHASH_ALL,
     SIGHASH_ANYONECANPAY,
     SIGHASH_NONE,
     SIGHASH_SINGLE,
+    PrecomputedTxData,
     getHashOutputs,
     getHashPrevouts,
     getHashSequence,
@@ -29,7 +34,7 @@ from .script import (
 # Transparent
 
 def transparent_digest(tx):
-    digest = blake2b(digest_size=32, person=b'ZTxIdTranspaHash')
+    digest = blake2b_personalized(b'ZTxIdTranspaHash')
 
     if len(tx.vin) + len(tx.vout) > 0:
         digest.update(getHashPrevouts(tx, b'ZTxIdPrevoutHash'))
@@ -39,7 +44,7 @@ def transparent_digest(tx):
     return digest.digest()
 
 def transparent_scripts_digest(tx):
-    digest = blake2b(digest_size=32, person=b'ZTxAuthTransHash')
+    digest = blake2b_personalized(b'ZTxAuthTransHash')
     for x in tx.vin:
         digest.update(ser_string(x.scriptSig))
     return digest.digest()
@@ -47,7 +52,7 @@ def transparent_scripts_digest(tx):
 # Sapling
 
 def sapling_digest(saplingBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxIdSaplingHash')
+    digest = blake2b_personalized(b'ZTxIdSaplingHash')
 
     if len(saplingBundle.spends) + len(saplingBundle.outputs) > 0:
         digest.update(sapling_spends_digest(saplingBundle))
@@ -57,7 +62,7 @@ def sapling_digest(saplingBundle):
     return digest.digest()
 
 def sapling_auth_digest(saplingBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxAuthSapliHash')
+    digest = blake2b_personalized(b'ZTxAuthSapliHash')
 
     if len(saplingBundle.spends) + len(saplingBundle.outputs) > 0:
         for desc in saplingBundle.spends:
@@ -73,7 +78,7 @@ def sapling_auth_digest(saplingBundle):
 # - Spends
 
 def sapling_spends_digest(saplingBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxIdSSpendsHash')
+    digest = blake2b_personalized(b'ZTxIdSSpendsHash')
 
     if len(saplingBundle.spends) > 0:
         digest.update(sapling_spends_compact_digest(saplingBundle))
@@ -82,13 +87,13 @@ def sapling_spends_digest(saplingBundle):
     return digest.digest()
 
 def sapling_spends_compact_digest(saplingBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxIdSSpendCHash')
+    digest = blake2b_personalized(b'ZTxIdSSpendCHash')
     for desc in saplingBundle.spends:
         digest.update(ser_uint256(desc.nullifier))
     return digest.digest()
 
 def sapling_spends_noncompact_digest(saplingBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxIdSSpendNHash')
+    digest = blake2b_personalized(b'ZTxIdSSpendNHash')
     for desc in saplingBundle.spends:
         digest.update(ser_uint256(desc.cv))
         digest.update(ser_uint256(saplingBundle.anchor))
@@ -98,7 +103,7 @@ def sapling_spends_noncompact_digest(saplingBundle):
 # - Outputs
 
 def sapling_outputs_digest(saplingBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxIdSOutputHash')
+    digest = blake2b_personalized(b'ZTxIdSOutputHash')
 
     if len(saplingBundle.outputs) > 0:
         digest.update(sapling_outputs_compact_digest(saplingBundle))
@@ -108,7 +113,7 @@ def sapling_outputs_digest(saplingBundle):
     return digest.digest()
 
 def sapling_outputs_compact_digest(saplingBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxIdSOutC__Hash')
+    digest = blake2b_personalized(b'ZTxIdSOutC__Hash')
     for desc in saplingBundle.outputs:
         digest.update(ser_uint256(desc.cmu))
         digest.update(ser_uint256(desc.ephemeralKey))
@@ -116,13 +121,13 @@ def sapling_outputs_compact_digest(saplingBundle):
     return digest.digest()
 
 def sapling_outputs_memos_digest(saplingBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxIdSOutM__Hash')
+    digest = blake2b_personalized(b'ZTxIdSOutM__Hash')
     for desc in saplingBundle.outputs:
         digest.update(desc.encCiphertext[52:564])
     return digest.digest()
 
 def sapling_outputs_noncompact_digest(saplingBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxIdSOutN__Hash')
+    digest = blake2b_personalized(b'ZTxIdSOutN__Hash')
     for desc in saplingBundle.outputs:
         digest.update(ser_uint256(desc.cv))
         digest.update(desc.encCiphertext[564:])
@@ -132,7 +137,7 @@ def sapling_outputs_noncompact_digest(saplingBundle):
 # Orchard
 
 def orchard_digest(orchardBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxIdOrchardHash')
+    digest = blake2b_personalized(b'ZTxIdOrchardHash')
 
     if len(orchardBundle.actions) > 0:
         digest.update(orchard_actions_compact_digest(orchardBundle))
@@ -145,7 +150,7 @@ def orchard_digest(orchardBundle):
     return digest.digest()
 
 def orchard_auth_digest(orchardBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxAuthOrchaHash')
+    digest = blake2b_personalized(b'ZTxAuthOrchaHash')
 
     if len(orchardBundle.actions) > 0:
         digest.update(bytes(orchardBundle.proofs))
@@ -158,7 +163,7 @@ def orchard_auth_digest(orchardBundle):
 # - Actions
 
 def orchard_actions_compact_digest(orchardBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxIdOrcActCHash')
+    digest = blake2b_personalized(b'ZTxIdOrcActCHash')
     for desc in orchardBundle.actions:
         digest.update(ser_uint256(desc.nullifier))
         digest.update(ser_uint256(desc.cmx))
@@ -167,13 +172,13 @@ def orchard_actions_compact_digest(orchardBundle):
     return digest.digest()
 
 def orchard_actions_memos_digest(orchardBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxIdOrcActMHash')
+    digest = blake2b_personalized(b'ZTxIdOrcActMHash')
     for desc in orchardBundle.actions:
         digest.update(desc.encCiphertext[52:564])
     return digest.digest()
 
 def orchard_actions_noncompact_digest(orchardBundle):
-    digest = blake2b(digest_size=32, person=b'ZTxIdOrcActNHash')
+    digest = blake2b_personalized(b'ZTxIdOrcActNHash')
     for desc in orchardBundle.actions:
         digest.update(ser_uint256(desc.cv))
         digest.update(ser_uint256(desc.rk))
@@ -184,7 +189,7 @@ def orchard_actions_noncompact_digest(orchardBundle):
 # Transaction
 
 def header_digest(tx):
-    digest = blake2b(digest_size=32, person=b'ZTxIdHeadersHash')
+    digest = blake2b_personalized(b'ZTxIdHeadersHash')
 
     digest.update(struct.pack('<I', (int(tx.fOverwintered)<<31) | tx.nVersion))
     digest.update(struct.pack('<I', tx.nVersionGroupId))
@@ -195,10 +200,7 @@ def header_digest(tx):
     return digest.digest()
 
 def txid_digest(tx):
-    digest = blake2b(
-        digest_size=32,
-        person=b'ZcashTxHash_' + struct.pack('<I', tx.nConsensusBranchId),
-    )
+    digest = blake2b_personalized(b'ZcashTxHash_' + struct.pack('<I', tx.nConsensusBranchId))
 
     digest.update(header_digest(tx))
     digest.update(transparent_digest(tx))
@@ -210,10 +212,7 @@ def txid_digest(tx):
 # Authorizing Data Commitment
 
 def auth_digest(tx):
-    digest = blake2b(
-        digest_size=32,
-        person=b'ZTxAuthHash_' + struct.pack('<I', tx.nConsensusBranchId),
-    )
+    digest = blake2b_personalized(b'ZTxAuthHash_' + struct.pack('<I', tx.nConsensusBranchId))
 
     digest.update(transparent_scripts_digest(tx))
     digest.update(sapling_auth_digest(tx.saplingBundle))
@@ -223,72 +222,181 @@ def auth_digest(tx):
 
 # Signatures
 
-def signature_digest(tx, nHashType, txin):
-    digest = blake2b(
-        digest_size=32,
-        person=b'ZcashTxHash_' + struct.pack('<I', tx.nConsensusBranchId),
-    )
+class TransparentInput(object):
+    """A transparent input of a transaction being signed: its index in
+    tx.vin, and the scriptPubKey and amount of the output it spends."""
+    def __init__(self, nIn, scriptPubKey, amount):
+        self.nIn = nIn
+        self.scriptPubKey = scriptPubKey
+        self.amount = amount
+
+def signature_digest(tx, t_inputs, nHashType, txin, precomputed=None):
+    # t_inputs is a TransparentInput for each of tx.vin, and txin is the one
+    # being signed, or None for a Sapling Spend or Orchard Action.
+    # precomputed is an optional PrecomputedTxData for tx, shared between
+    # calls for different inputs or hash types (with the same t_inputs).
+    if precomputed is None:
+        precomputed = PrecomputedTxData(tx)
+    else:
+        assert precomputed.tx is tx
 
-    digest.update(header_digest(tx))
-    digest.update(transparent_sig_digest(tx, nHashType, txin))
-    digest.update(sapling_digest(tx.saplingBundle))
-    digest.update(orchard_digest(tx.orchardBundle))
+    digest = blake2b_personalized(b'ZcashTxHash_' + struct.pack('<I', tx.nConsensusBranchId))
+
+    digest.update(precomputed.digest('header_digest', header_digest))
+    digest.update(transparent_sig_digest(tx, t_inputs, nHashType, txin, precomputed))
+    digest.update(precomputed.digest(
+        'sapling_digest', lambda tx: sapling_digest(tx.saplingBundle)))
+    digest.update(precomputed.digest(
+        'orchard_digest', lambda tx: orchard_digest(tx.orchardBundle)))
 
     return digest.digest()
 
-def transparent_sig_digest(tx, nHashType, txin):
-    # Sapling Spend or Orchard Action
-    if txin is None:
-        return transparent_digest(tx)
+def _is_coinbase(tx):
+    return len(tx.vin) == 1 and tx.vin[0].prevout.hash == 0 and tx.vin[0].prevout.n == 0xFFFFFFFF
+
+def transparent_sig_digest(tx, t_inputs, nHashType, txin, precomputed=None):
+    if precomputed is None:
+        precomputed = PrecomputedTxData(tx)
 
-    digest = blake2b(digest_size=32, person=b'ZTxIdTranspaHash')
+    # A coinbase transaction, or one without transparent inputs
+    if _is_coinbase(tx) or len(tx.vin) == 0:
+        return precomputed.digest('transparent_digest', transparent_digest)
 
-    digest.update(prevouts_sig_digest(tx, nHashType))
-    digest.update(sequence_sig_digest(tx, nHashType))
-    digest.update(outputs_sig_digest(tx, nHashType, txin))
+    digest = blake2b_personalized(b'ZTxIdTranspaHash')
+
+    digest.update(struct.pack('B', nHashType))
+    digest.update(prevouts_sig_digest(tx, nHashType, precomputed))
+    digest.update(amounts_sig_digest(tx, t_inputs, nHashType, precomputed))
+    digest.update(scriptpubkeys_sig_digest(tx, t_inputs, nHashType, precomputed))
+    digest.update(sequence_sig_digest(tx, nHashType, precomputed))
+    digest.update(outputs_sig_digest(tx, nHashType, txin, precomputed))
     digest.update(txin_sig_digest(tx, txin))
 
     return digest.digest()
 
-def prevouts_sig_digest(tx, nHashType):
+def prevouts_sig_digest(tx, nHashType, precomputed=None):
+    if precomputed is None:
+        precomputed = PrecomputedTxData(tx)
+
+    # If the SIGHASH_ANYONECANPAY flag is not set:
+    if not (nHashType & SIGHASH_ANYONECANPAY):
+        return precomputed.digest(
+            'prevouts_digest', lambda tx: getHashPrevouts(tx, b'ZTxIdPrevoutHash'))
+    else:
+        return blake2b_personalized(b'ZTxIdPrevoutHash').digest()
+
+def amounts_sig_digest(tx, t_inputs, nHashType, precomputed=None):
+    if precomputed is None:
+        precomputed = PrecomputedTxData(tx)
+
     # If the SIGHASH_ANYONECANPAY flag is not set:
     if not (nHashType & SIGHASH_ANYONECANPAY):
-        return getHashPrevouts(tx, b'ZTxIdPrevoutHash')
+        return precomputed.digest('amounts_digest', lambda tx: digest_many(
+            b'ZTxTrAmountsHash', (struct.pack('<q', x.amount) for x in t_inputs)))
     else:
-        return blake2b(digest_size=32, person=b'ZTxIdPrevoutHash').digest()
-
-def sequence_sig_digest(tx, nHashType):
-    # if the SIGHASH_ANYONECANPAY flag is not set, and the sighash type is neither
-    # SIGHASH_SINGLE nor SIGHASH_NONE:
-    if (
-        (not (nHashType & SIGHASH_ANYONECANPAY)) and \
-        (nHashType & 0x1f) != SIGHASH_SINGLE and \
-        (nHashType & 0x1f) != SIGHASH_NONE
-    ):
-        return getHashSequence(tx, b'ZTxIdSequencHash')
+        return blake2b_personalized(b'ZTxTrAmountsHash').digest()
+
+def scriptpubkeys_sig_digest(tx, t_inputs, nHashType, precomputed=None):
+    if precomputed is None:
+        precomputed = PrecomputedTxData(tx)
+
+    # If the SIGHASH_ANYONECANPAY flag is not set:
+    if not (nHashType & SIGHASH_ANYONECANPAY):
+        return precomputed.digest('scriptpubkeys_digest', lambda tx: digest_many(
+            b'ZTxTrScriptsHash', (ser_string(x.scriptPubKey) for x in t_inputs)))
     else:
-        return blake2b(digest_size=32, person=b'ZTxIdSequencHash').digest()
+        return blake2b_personalized(b'ZTxTrScriptsHash').digest()
+
+def sequence_sig_digest(tx, nHashType, precomputed=None):
+    if precomputed is None:
+        precomputed = PrecomputedTxData(tx)
+
+    # If the SIGHASH_ANYONECANPAY flag is not set:
+    if not (nHashType & SIGHASH_ANYONECANPAY):
+        return precomputed.digest(
+            'sequence_digest', lambda tx: getHashSequence(tx, b'ZTxIdSequencHash'))
+    else:
+        return blake2b_personalized(b'ZTxIdSequencHash').digest()
+
+def outputs_sig_digest(tx, nHashType, txin, precomputed=None):
+    if precomputed is None:
+        precomputed = PrecomputedTxData(tx)
 
-def outputs_sig_digest(tx, nHashType, txin):
     # If the sighash type is neither SIGHASH_SINGLE nor SIGHASH_NONE:
     if (nHashType & 0x1f) != SIGHASH_SINGLE and (nHashType & 0x1f) != SIGHASH_NONE:
-        return getHashOutputs(tx, b'ZTxIdOutputsHash')
+        return precomputed.digest(
+            'outputs_digest', lambda tx: getHashOutputs(tx, b'ZTxIdOutputsHash'))
 
     # If the sighash type is SIGHASH_SINGLE and the signature hash is being computed for
     # the transparent input at a particular index, and a transparent output appears in the
     # transaction at that index:
-    elif (nHashType & 0x1f) == SIGHASH_SINGLE and 0 <= txin.nIn and txin.nIn < len(tx.vout):
-        digest = blake2b(digest_size=32, person=b'ZTxIdOutputsHash')
-        digest.update(bytes(tx.vout[txin.nIn]))
+    elif (nHashType & 0x1f) == SIGHASH_SINGLE and txin is not None and txin.nIn < len(tx.vout):
+        digest = blake2b_personalized(b'ZTxIdOutputsHash')
+        digest.update(tx.vout[txin.nIn].serialize())
         return digest.digest()
 
     else:
-        return blake2b(digest_size=32, person=b'ZTxIdOutputsHash').digest()
+        return blake2b_personalized(b'ZTxIdOutputsHash').digest()
 
 def txin_sig_digest(tx, txin):
-    digest = blake2b(digest_size=32, person=b'Zcash___TxInHash')
-    digest.update(bytes(tx.vin[txin.nIn].prevout))
-    digest.update(ser_string(txin.scriptCode))
-    digest.update(struct.pack('<Q', txin.amount))
-    digest.update(struct.pack('<I', tx.vin[txin.nIn].nSequence))
+    digest = blake2b_personalized(b'Zcash___TxInHash')
+    # Empty for a Sapling Spend or Orchard Action
+    if txin is not None:
+        digest.update(tx.vin[txin.nIn].prevout.serialize())
+        digest.update(struct.pack('<q', txin.amount))
+        digest.update(ser_string(txin.scriptPubKey))
+        digest.update(struct.pack('<I', tx.vin[txin.nIn].nSequence))
     return digest.digest()
+
+
+ZIP244_JSON = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'src', 'test', 'data', 'zip0244.json')
+
+# The hash types of the sighash_* columns of the vectors, in order.
+ZIP244_SIGHASH_TYPES = [SIGHASH_ALL, SIGHASH_NONE, SIGHASH_SINGLE]
+ZIP244_SIGHASH_TYPES += [hashtype | SIGHASH_ANYONECANPAY for hashtype in ZIP244_SIGHASH_TYPES]
+
+def _zip244_vectors():
+    # The vectors in zip0244.json, as (tx, t_inputs, txid, auth digest,
+    # expected signature digests), where the expected signature digests are
+    # (txin, hashtype, digest) for the shielded signature digest and those
+    # of the transparent input, if the vector has one. The digests are hex
+    # in byte-reversed (uint256) order.
+    with open(ZIP244_JSON, encoding='utf8') as f:
+        vectors = json.load(f)
+    for vector in vectors[2:]:
+        (raw_tx, txid, auth, amounts, script_pubkeys, nIn, sighash_shielded) = vector[:7]
+        tx = CTransaction()
+        tx.deserialize(BytesIO(bytes.fromhex(raw_tx)))
+        t_inputs = [
+            TransparentInput(i, bytes.fromhex(script_pubkey), amount)
+            for (i, (amount, script_pubkey)) in enumerate(zip(amounts, script_pubkeys))]
+        expected = [(None, SIGHASH_ALL, sighash_shielded)]
+        if nIn is not None:
+            expected += [
+                (t_inputs[nIn], hashtype, sighash)
+                for (hashtype, sighash) in zip(ZIP244_SIGHASH_TYPES, vector[7:])
+                if sighash is not None]
+        yield (tx, t_inputs, txid, auth, expected)
+
+class TestFrameworkZip244(unittest.TestCase):
+    def setUp(self):
+        if not os.path.exists(ZIP244_JSON):
+            self.skipTest('%s not found' % ZIP244_JSON)
+
+    def test_txid_and_auth_digest(self):
+        for (tx, _, txid, auth, _) in _zip244_vectors():
+            self.assertEqual(txid_digest(tx)[::-1].hex(), txid)
+            self.assertEqual(auth_digest(tx)[::-1].hex(), auth)
+
+    def test_signature_digest(self):
+        checked = 0
+        for (tx, t_inputs, _, _, expected) in _zip244_vectors():
+            precomputed = PrecomputedTxData(tx)
+            for (txin, hashtype, sighash) in expected:
+                for shared in [precomputed, None]:
+                    self.assertEqual(
+                        signature_digest(tx, t_inputs, hashtype, txin, shared)[::-1].hex(),
+                        sighash)
+                checked += 1
+        self.assertGreater(checked, 0)
@@ -9,7 +9,8 @@
 #
 
 from test_framework.test_framework import BitcoinTestFramework
-from test_framework.util import assert_equal, bytes_to_hex_str, start_nodes
+from test_framework.syncnotify import SyncNotifier, zmq_notify_args
+from test_framework.util import assert_equal, bytes_to_hex_str, start_nodes, zmq_port
 
 import zmq
 import struct
@@ -28,21 +29,24 @@ class ZMQTest(BitcoinTestFramework):
         self.zmqSubSocket.setsockopt(zmq.SUBSCRIBE, b"hashblock")
         self.zmqSubSocket.setsockopt(zmq.SUBSCRIBE, b"hashtx")
         self.zmqSubSocket.connect("tcp://127.0.0.1:%i" % self.port)
+        # sync_all waits on the notifications of all the nodes; node 0
+        # already publishes them on self.port.
+        ports = [self.port] + [zmq_port(i) for i in range(1, self.num_nodes)]
+        self.sync_notifier = SyncNotifier(ports)
         return start_nodes(self.num_nodes, self.options.tmpdir, extra_args=[
             [
                 '-zmqpubhashtx=tcp://127.0.0.1:'+str(self.port),
                 '-zmqpubhashblock=tcp://127.0.0.1:'+str(self.port),
                 '-allowdeprecated=getnewaddress',
             ],
-            [],
-            [],
-            []
-            ])
+        ] + [zmq_notify_args(port) for port in ports[1:]])
 
     def run_test(self):
         self.sync_all()
 
         genhashes = self.nodes[0].generate(1)
+        # The block wakes up the notifier that sync_all waits on.
+        assert(self.sync_notifier.wait(60))
         self.sync_all()
 
         print("listen...")